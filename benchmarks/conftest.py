@@ -0,0 +1,116 @@
+"""
+Fixtures and regression gate of the microbenchmark suite.
+
+The suite runs on a fixed SQLite dataset and a fake Redis, so results only
+depend on the code and the machine. Runs are stored under
+``benchmarks/baselines``; comparing against a stored run fails every
+benchmark whose median regressed by more than ``BENCHMARK_MAX_REGRESSION``
+percent (default 20)::
+
+    pytest benchmarks --benchmark-save=baseline
+    pytest benchmarks --benchmark-compare
+
+An explicit ``--benchmark-storage`` or ``--benchmark-compare-fail`` wins.
+"""
+import asyncio
+import os
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+import fakeredis
+import pytest
+from pytest_benchmark.utils import parse_compare_fail
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User, UserRole, birthday_key
+from src.security import oauth, passwords
+
+BASELINES = Path(__file__).resolve().parent / "baselines"
+BENCHMARK_MAX_REGRESSION = int(os.getenv("BENCHMARK_MAX_REGRESSION", "20"))
+
+USERS = 5
+CONTACTS_PER_USER = 1000
+USERNAME = "bench-{}@example.com"
+PASSWORD = "bench-password"
+NAMES = ("Olena", "Taras", "Iryna", "Mykola", "Sofia", "Andrii", "Oksana", "Dmytro",
+         "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk")
+
+
+def pytest_configure(config):
+    option = config.option
+    if option.benchmark_storage == "file://./.benchmarks":
+        option.benchmark_storage = f"file://{BASELINES}"
+    if option.benchmark_compare and not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [parse_compare_fail(f"median:{BENCHMARK_MAX_REGRESSION}%")]
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """
+    Event loop shared by the async hot paths.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def fake_redis():
+    """
+    Make the application's Redis client a fake one for the whole session.
+    """
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(oauth, "get_redis", lambda: client)
+        oauth.get_user_cache.cache_clear()
+        yield client
+    oauth.get_user_cache.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def password_hash():
+    return passwords.get_password_hash(PASSWORD)
+
+
+@pytest.fixture(scope="session")
+def dataset(password_hash):
+    """
+    In-memory SQLite database with ``USERS`` users of ``CONTACTS_PER_USER`` contacts each.
+
+    :return: Session factory and the user IDs.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    rng = random.Random(0)
+    with engine.begin() as connection:
+        user_ids = connection.execute(
+            insert(User.__table__).returning(User.id),
+            [{"username": USERNAME.format(i), "password": password_hash,
+              "role": UserRole.USER, "is_verified": True} for i in range(USERS)]).scalars().all()
+        for user_id in user_ids:
+            rows = []
+            for j in range(CONTACTS_PER_USER):
+                birthday = date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 40))
+                rows.append({"first_name": rng.choice(NAMES), "last_name": rng.choice(NAMES),
+                             "email": f"c{user_id}-{j}@bench.example.com",
+                             "phone": f"+380{user_id:05d}{j:05d}", "birthday": birthday,
+                             "birthday_key": birthday_key(birthday), "user_id": user_id})
+            connection.execute(insert(Contact.__table__), rows)
+    yield sessionmaker(bind=engine, autoflush=False), user_ids
+    engine.dispose()
+
+
+@pytest.fixture
+def db(dataset):
+    session = dataset[0]()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user_id(dataset):
+    return dataset[1][0]
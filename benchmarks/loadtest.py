@@ -0,0 +1,367 @@
+"""
+HTTP load test.
+
+Seeds synthetic tenants, drives the API with scripted scenarios from many
+concurrent virtual users, and writes a JSON report with the throughput and
+p50/p95/p99 latency of each route, so runs before and after a change can be
+compared side by side.
+
+Scenarios (``--scenario``, default ``mixed``):
+
+- ``login`` -- login storm on ``POST /token``
+- ``read`` -- contact list pages (following ``X-Next-Cursor``) and searches
+- ``birthdays`` -- upcoming birthday windows
+- ``write`` -- create, patch, replace and delete a contact
+- ``mixed`` -- weighted mix of the above (see ``MIX``)
+
+Usage::
+
+    python benchmarks/loadtest.py --users 50 --contacts 200 --concurrency 32 \\
+        --duration 30 --output before.json
+    python benchmarks/loadtest.py --base-url http://localhost:8000 --no-seed \\
+        --scenario read --baseline before.json --max-p95-ms 150
+
+Without ``--base-url`` a uvicorn server is started on a throwaway SQLite
+database, or on ``--database-url`` (e.g. a local Postgres), with the rate
+limiter disabled; Redis is taken from ``REDIS_URL`` as usual. The process
+exits with status 1 when a route's p95 or p99 exceeds its ``--max-*`` budget.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+USERNAME = "load-{:05d}@example.com"
+PASSWORD = "load-test-password"
+FIRST_NAMES = ("Olena", "Taras", "Iryna", "Mykola", "Sofia", "Andrii", "Oksana", "Dmytro",
+               "Kateryna", "Bohdan", "Marta", "Yurii", "Larysa", "Petro", "Halyna", "Serhii")
+LAST_NAMES = ("Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk",
+              "Boyko", "Koval", "Oliynyk", "Lysenko", "Marchenko", "Rudenko", "Savchenko")
+
+MIX = {"list": 35, "search": 25, "birthdays": 15, "write": 20, "login": 5}
+SCENARIOS = {
+    "login": {"login": 1},
+    "read": {"list": 3, "search": 2},
+    "birthdays": {"birthdays": 1},
+    "write": {"write": 1},
+    "mixed": MIX,
+}
+
+
+def seed(database_url: str, users: int, contacts: int, rng: random.Random) -> None:
+    """
+    Create the schema and replace the synthetic tenants.
+
+    Every tenant gets ``contacts`` contacts with names from fixed pools and
+    birthdays spread over the year, so searches and birthday windows match.
+    All tenants share one password hash, so seeding does not pay for bcrypt.
+
+    :param database_url: Synchronous SQLAlchemy URL.
+    :type database_url: str
+    :param users: Number of tenants.
+    :type users: int
+    :param contacts: Contacts per tenant.
+    :type contacts: int
+    :param rng: Source of the synthetic data.
+    :type rng: random.Random
+    """
+    from sqlalchemy import create_engine, delete, insert, select
+    from src.database.models import Base, Contact, User, UserRole, birthday_key
+    from src.security.passwords import get_password_hash
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    password = get_password_hash(PASSWORD)
+    start = date(1970, 1, 1)
+    with engine.begin() as connection:
+        old = select(User.id).where(User.username.like("load-%@example.com"))
+        connection.execute(delete(Contact.__table__).where(Contact.user_id.in_(old)))
+        connection.execute(delete(User.__table__).where(User.username.like("load-%@example.com")))
+        user_ids = connection.execute(
+            insert(User.__table__).returning(User.id),
+            [{"username": USERNAME.format(i), "password": password, "role": UserRole.USER,
+              "is_verified": True} for i in range(users)]).scalars().all()
+        for user_id in user_ids:
+            rows = []
+            for j in range(contacts):
+                birthday = start + timedelta(days=rng.randrange(365 * 40))
+                rows.append({
+                    "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES),
+                    "email": f"c{user_id}-{j}@load.example.com", "phone": f"+380{user_id:05d}{j:05d}",
+                    "birthday": birthday, "birthday_key": birthday_key(birthday),
+                    "user_id": user_id})
+            connection.execute(insert(Contact.__table__), rows)
+    engine.dispose()
+
+
+class Recorder:
+    """
+    Collects the latency and status of every request, grouped by route template.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs):
+        """
+        Send a request and record it under ``route`` once the warm-up is over.
+
+        :return: Response, or None if the request failed at the transport level.
+        :rtype: httpx.Response or None
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        if self.recording:
+            self.latencies[route].append((time.perf_counter() - start) * 1000)
+            self.statuses[route][status] += 1
+        return response
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: list[float], statuses: dict, seconds: float) -> dict:
+    """
+    Reduce the samples of one route.
+
+    Transport failures (status 0) and 5xx responses count as errors.
+
+    :return: Count, errors, throughput and latency statistics in milliseconds.
+    :rtype: dict
+    """
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": sum(n for status, n in statuses.items() if status == 0 or status >= 500),
+        "rps": round(len(ordered) / seconds, 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        **{f"p{p}_ms": round(percentile(ordered, p), 2) for p in (50, 95, 99)},
+        "max_ms": round(ordered[-1], 2),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+class VirtualUser:
+    """
+    One client session: logs in as a tenant, then runs actions until stopped.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, username: str,
+                 rng: random.Random, weights: dict):
+        self.client = client
+        self.recorder = recorder
+        self.username = username
+        self.rng = rng
+        self.actions = list(weights)
+        self.weights = list(weights.values())
+        self.headers = {}
+
+    async def login(self) -> None:
+        response = await self.recorder.call(
+            self.client, "POST /token", "POST", "/token",
+            data={"username": self.username, "password": PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def list(self) -> None:
+        params = {"limit": 50}
+        for _ in range(self.rng.randint(1, 3)):
+            response = await self.recorder.call(
+                self.client, "GET /contacts/", "GET", "/contacts/", params=params, headers=self.headers)
+            cursor = response is not None and response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params = {"limit": 50, "after": cursor}
+
+    async def search(self) -> None:
+        if self.rng.random() < 0.5:
+            params = {"q": self.rng.choice(FIRST_NAMES + LAST_NAMES)[:4].lower()}
+        else:
+            params = {"last_name": self.rng.choice(LAST_NAMES)}
+        await self.recorder.call(
+            self.client, "GET /contacts/search/", "GET", "/contacts/search/",
+            params=params, headers=self.headers)
+
+    async def birthdays(self) -> None:
+        await self.recorder.call(
+            self.client, "GET /contacts/upcoming_birthdays/", "GET", "/contacts/upcoming_birthdays/",
+            params={"days": self.rng.choice((7, 30, 90))}, headers=self.headers)
+
+    async def write(self) -> None:
+        tag = f"{self.rng.getrandbits(48):012x}"
+        contact = {"first_name": self.rng.choice(FIRST_NAMES), "last_name": self.rng.choice(LAST_NAMES),
+                   "email": f"w-{tag}@load.example.com", "phone": f"+1{int(tag, 16) % 10 ** 12:012d}",
+                   "birthday": "1990-05-17"}
+        response = await self.recorder.call(
+            self.client, "POST /contacts/", "POST", "/contacts/", json=contact, headers=self.headers)
+        if response is None or response.status_code != 201:
+            return
+        url = f"/contacts/{response.json()['id']}"
+        await self.recorder.call(
+            self.client, "PATCH /contacts/{contact_id}", "PATCH", url,
+            json={"extra_data": "patched"}, headers=self.headers)
+        await self.recorder.call(
+            self.client, "PUT /contacts/{contact_id}", "PUT", url,
+            json={**contact, "last_name": "Replaced"}, headers=self.headers)
+        await self.recorder.call(
+            self.client, "DELETE /contacts/{contact_id}", "DELETE", url, headers=self.headers)
+
+    async def run(self, deadline: float) -> None:
+        await self.login()
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(self.actions, self.weights)[0]
+            await getattr(self, action)()
+
+
+async def drive(args, recorder: Recorder) -> float:
+    """
+    Run the virtual users through the warm-up and the measured period.
+
+    :return: Length of the measured period in seconds.
+    :rtype: float
+    """
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        deadline = start + args.warmup + args.duration
+        users = [VirtualUser(client, recorder, USERNAME.format(i % args.users),
+                             random.Random(args.seed + i), SCENARIOS[args.scenario])
+                 for i in range(args.concurrency)]
+        tasks = [asyncio.create_task(user.run(deadline)) for user in users]
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        measured = time.perf_counter()
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - measured
+
+
+def start_server(args, tmp: str) -> subprocess.Popen:
+    """
+    Start uvicorn on a free port and wait until it answers.
+
+    :return: Server process; ``args.base_url`` is set to its address.
+    :rtype: subprocess.Popen
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, "DATABASE_URL": args.database_url, "RATE_LIMIT_ENABLED": "false",
+           "STORAGE_BACKEND": "local", "STORAGE_LOCAL_ROOT": f"{tmp}/media"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"], cwd=ROOT, env=env)
+    args.base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(args.base_url + "/openapi.json", timeout=1)
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+def compare(routes: dict, baseline: dict) -> dict:
+    """
+    Percent change of each route's percentiles against an earlier report.
+    """
+    changes = {}
+    for route, stats in routes.items():
+        before = baseline.get("routes", {}).get(route)
+        if before:
+            changes[route] = {key: round((stats[key] - before[key]) / before[key] * 100, 1)
+                              for key in ("p50_ms", "p95_ms", "p99_ms") if before[key]}
+    return changes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--users", type=int, default=20, help="synthetic tenants")
+    parser.add_argument("--contacts", type=int, default=200, help="contacts per tenant")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--base-url", help="test a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--no-seed", action="store_true", help="reuse tenants seeded by an earlier run")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare percentiles with")
+    parser.add_argument("--max-p95-ms", type=float, help="p95 budget of every route")
+    parser.add_argument("--max-p99-ms", type=float, help="p99 budget of every route")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.database_url = args.database_url or f"sqlite:///{tmp}/loadtest.db"
+        if not args.no_seed:
+            seed(args.database_url, args.users, args.contacts, random.Random(args.seed))
+        server = None if args.base_url else start_server(args, tmp)
+        recorder = Recorder()
+        try:
+            seconds = asyncio.run(drive(args, recorder))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    routes = {route: summarize(latencies, recorder.statuses[route], seconds)
+              for route, latencies in sorted(recorder.latencies.items())}
+    everything = [value for latencies in recorder.latencies.values() for value in latencies]
+    everything_statuses = defaultdict(int)
+    for statuses in recorder.statuses.values():
+        for status, n in statuses.items():
+            everything_statuses[status] += n
+    report = {
+        "scenario": args.scenario,
+        "config": {key: getattr(args, key) for key in
+                   ("users", "contacts", "concurrency", "duration", "warmup", "seed", "workers")},
+        "database": args.database_url.split(":", 1)[0],
+        "seconds": round(seconds, 2),
+        "total": summarize(everything, everything_statuses, seconds) if everything else None,
+        "routes": routes,
+    }
+    if args.baseline:
+        report["change_pct"] = compare(routes, json.loads(Path(args.baseline).read_text()))
+    report["over_budget"] = [
+        f"{route} {key}" for route, stats in routes.items()
+        for key, budget in (("p95_ms", args.max_p95_ms), ("p99_ms", args.max_p99_ms))
+        if budget is not None and stats[key] > budget]
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+    return 1 if report["over_budget"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
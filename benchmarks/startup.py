@@ -0,0 +1,151 @@
+"""
+Startup-time benchmark.
+
+Starts fresh interpreters and measures, in each one:
+
+- ``import_ms`` -- ``import src.main`` (module-level work, including building the app)
+- ``startup_ms`` -- the lifespan warm-up (tables, first DB connection, Redis ping)
+- ``first_request_ms`` -- the first request, ``GET /contacts/`` as a seeded user: token
+  check, user lookup and the first contacts query
+- ``total_ms`` -- interpreter start to first response, as seen from outside the process
+
+Each run signs in as its own user, created before the runs, so the user
+lookup is not served from a cache a previous run filled.
+
+Prints a JSON report with the median and worst run of each phase and exits
+with status 1 when a median exceeds its ``--max-*`` budget, so slow cold
+starts fail CI before they slow down autoscaling.
+
+Usage::
+
+    python benchmarks/startup.py --runs 10 --max-import-ms 1500 --max-first-request-ms 200
+
+The database defaults to a throwaway SQLite file; pass ``--database-url`` (or
+set ``DATABASE_URL``) to measure against Postgres.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SEED = """
+import sys
+import src.main
+from fastapi.testclient import TestClient
+from src.database import user_repository
+from src.database.models import UserRole
+from src.database.session import get_sessionmaker
+with TestClient(src.main.app):  # the warm-up creates the tables
+    with get_sessionmaker()() as db:
+        for username in sys.argv[1:]:
+            user_repository.create_user(db, username, "not-a-password-hash", UserRole.USER)
+"""
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import src.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient  # harness, not timed
+from src.security.oauth import create_access_token
+token = create_access_token({"sub": sys.argv[1], "type": "access"})
+client = TestClient(src.main.app)
+t1b = time.perf_counter()
+client.__enter__()
+t2 = time.perf_counter()
+status = client.get("/contacts/", headers={"Authorization": f"Bearer {token}"}).status_code
+t3 = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "startup_ms": (t2 - t1b) * 1000,
+                  "first_request_ms": (t3 - t2) * 1000, "status": status}))
+"""
+
+USERNAME = "startup-{}-{}@example.com"
+
+PHASES = ("import_ms", "startup_ms", "first_request_ms", "total_ms")
+
+
+def seed(env: dict, usernames: list[str]) -> None:
+    """
+    Create the tables and the users of the runs.
+
+    :param env: Environment of the child process.
+    :type env: dict
+    :param usernames: Usernames to create.
+    :type usernames: list[str]
+    """
+    subprocess.run([sys.executable, "-c", SEED, *usernames], cwd=ROOT, env=env,
+                   capture_output=True, text=True, check=True)
+
+
+def run_once(env: dict, username: str) -> dict:
+    """
+    Measure one cold start in a new interpreter.
+
+    :param env: Environment of the child process.
+    :type env: dict
+    :param username: Seeded user making the first request.
+    :type username: str
+    :return: Milliseconds spent in each phase.
+    :rtype: dict
+    :raises RuntimeError: If the first request did not succeed.
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD, username], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total_ms"] = (time.perf_counter() - start) * 1000
+    if result["status"] != 200:
+        raise RuntimeError(f"First request returned {result['status']}, expected 200")
+    return result
+
+
+def summarize(runs: list[dict]) -> dict:
+    """
+    Reduce the runs to the median and worst value of each phase.
+
+    :param runs: Results of :func:`run_once`.
+    :type runs: list[dict]
+    :return: ``{phase: {"median": ms, "max": ms}}``.
+    :rtype: dict
+    """
+    return {phase: {"median": round(statistics.median(run[phase] for run in runs), 2),
+                    "max": round(max(run[phase] for run in runs), 2)}
+            for phase in PHASES}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    for phase in PHASES:
+        parser.add_argument(f"--max-{phase.replace('_ms', '').replace('_', '-')}-ms", type=float,
+                            dest=f"max_{phase}", help=f"budget for the median {phase}")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1",
+               "DATABASE_URL": args.database_url or f"sqlite:///{tmp}/startup.db"}
+        # Unique per invocation, so runs against a shared database start cold too
+        usernames = [USERNAME.format(os.getpid(), i) for i in range(args.runs)]
+        seed(env, usernames)
+        runs = [run_once(env, username) for username in usernames]
+
+    report = {"runs": args.runs, **summarize(runs)}
+    failures = [phase for phase in PHASES
+                if getattr(args, f"max_{phase}") is not None
+                and report[phase]["median"] > getattr(args, f"max_{phase}")]
+    report["over_budget"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Microbenchmarks of the code every request runs.
+
+Run with ``pytest benchmarks``; see ``benchmarks/conftest.py`` for baselines
+and the regression gate.
+"""
+from datetime import date
+
+import pytest
+from pydantic import TypeAdapter
+
+from src.configuration.schemas import ContactOut
+from src.database import contacts_repository
+from src.routers.contacts import _dump_contacts
+from src.security import oauth, passwords
+
+from conftest import PASSWORD, USERNAME
+
+TODAY = date(2025, 6, 15)
+
+
+@pytest.fixture
+def token():
+    return oauth.create_access_token({"sub": USERNAME.format(0), "type": "access"})
+
+
+def test_create_access_token(benchmark):
+    benchmark(oauth.create_access_token, {"sub": USERNAME.format(0), "type": "access"})
+
+
+def test_verify_password(benchmark, password_hash):
+    assert benchmark(passwords.verify_password, PASSWORD, password_hash)
+
+
+def test_get_current_user_l1_hit(benchmark, loop, fake_redis, db, token):
+    loop.run_until_complete(oauth.get_current_user(token, db))
+    user = benchmark(lambda: loop.run_until_complete(oauth.get_current_user(token, db)))
+    assert user.username == USERNAME.format(0)
+
+
+def test_get_current_user_l2_hit(benchmark, loop, fake_redis, db, token):
+    cache = oauth.get_user_cache()
+    loop.run_until_complete(oauth.get_current_user(token, db))
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(oauth.get_current_user(token, db)),
+        setup=lambda: cache.local.pop(USERNAME.format(0)), rounds=200)
+    assert cache.snapshot()["l2_hits"] >= 200
+
+
+def test_get_current_user_miss(benchmark, loop, fake_redis, db, token):
+    cache = oauth.get_user_cache()
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(oauth.get_current_user(token, db)),
+        setup=lambda: loop.run_until_complete(cache.invalidate(USERNAME.format(0))), rounds=200)
+
+
+@pytest.mark.benchmark(group="contact-list-serialization")
+def test_dump_contact_list(benchmark, db, user_id):
+    contacts = contacts_repository.get_contacts(db, user_id, limit=100)
+    assert len(contacts) == 100
+    benchmark.extra_info["rows"] = len(contacts)
+    benchmark(_dump_contacts, contacts)
+
+
+@pytest.mark.benchmark(group="contact-list-serialization")
+def test_dump_contact_list_validated(benchmark, db, user_id):
+    # Reference: what FastAPI does with response_model=list[ContactOut]
+    adapter = TypeAdapter(list[ContactOut])
+    contacts = contacts_repository.get_contacts(db, user_id, limit=100)
+    benchmark.extra_info["rows"] = len(contacts)
+    result = benchmark(lambda: adapter.dump_json(adapter.validate_python(contacts, from_attributes=True)))
+    assert result == _dump_contacts(contacts)
+
+
+def test_get_contacts_offset(benchmark, db, user_id):
+    assert len(benchmark(contacts_repository.get_contacts, db, user_id, skip=500, limit=100)) == 100
+
+
+def test_get_contacts_after(benchmark, db, user_id):
+    first, _ = contacts_repository.get_contacts_after(db, user_id, limit=500)
+    contacts, _ = benchmark(contacts_repository.get_contacts_after, db, user_id, first[-1].id, 100)
+    assert len(contacts) == 100
+
+
+def test_get_contact(benchmark, db, user_id):
+    contact_id = contacts_repository.get_contacts(db, user_id, limit=1)[0].id
+    assert benchmark(contacts_repository.get_contact, db, contact_id, user_id) is not None
+
+
+def test_iter_contacts(benchmark, db, user_id):
+    rows = benchmark(lambda: sum(len(batch) for batch in contacts_repository.iter_contacts(db, user_id, 250)))
+    assert rows == 1000
+
+
+def test_search_contacts_by_field(benchmark, db, user_id):
+    assert benchmark(contacts_repository.search_contacts, db, user_id, last_name="Melnyk")
+
+
+def test_search_contacts_free_text(benchmark, db, user_id):
+    assert benchmark(contacts_repository.search_contacts, db, user_id, q="kova")
+
+
+def test_get_upcoming_birthdays(benchmark, db, user_id):
+    assert benchmark(contacts_repository.get_upcoming_birthdays, db, user_id, days=30, today=TODAY)
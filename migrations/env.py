@@ -0,0 +1,91 @@
+"""
+Alembic environment for the contacts database.
+
+Runs against ``sqlalchemy.url`` from ``alembic.ini`` when set, otherwise
+``DATABASE_URL``. Migrations build indexes inside
+``op.get_context().autocommit_block()`` with ``postgresql_concurrently``, so
+each migration gets its own transaction and those blocks can step out of it.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from src.database import models  # noqa: F401  registers the tables on Base.metadata
+from src.database.session import DATABASE_URL, Base
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Tables maintained by raw DDL rather than the models (SQLite full-text search)
+UNMANAGED_TABLES = {"contacts_fts", "contacts_fts_data", "contacts_fts_idx",
+                    "contacts_fts_docsize", "contacts_fts_config"}
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """
+    Keep unmanaged tables out of autogenerate comparisons.
+    """
+    return not (type_ == "table" and name in UNMANAGED_TABLES)
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """
+    Skip model indexes restricted to another dialect, e.g. Postgres trigram indexes on SQLite.
+    """
+    ddl_if = getattr(obj, "_ddl_if", None)
+    if type_ == "index" and not reflected and ddl_if is not None and ddl_if.dialect:
+        return context.get_context().dialect.name == ddl_if.dialect
+    return True
+
+
+def database_url() -> str:
+    """
+    Return the URL to migrate.
+    """
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    """
+    Emit the migration SQL without connecting to the database.
+    """
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
+        include_object=include_object,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """
+    Apply migrations over a dedicated, unpooled connection.
+    """
+    connectable = create_engine(database_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
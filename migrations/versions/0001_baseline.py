@@ -0,0 +1,61 @@
+"""Baseline schema: contacts and users as originally created by create_all
+
+Databases created by ``Base.metadata.create_all`` before migrations were
+introduced are brought under Alembic with ``alembic stamp 0001``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "contacts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("last_name", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("phone", sa.String(), nullable=True),
+        sa.Column("birthday", sa.Date(), nullable=True),
+        sa.Column("extra_data", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_contacts_id", "contacts", ["id"])
+    op.create_index("ix_contacts_first_name", "contacts", ["first_name"])
+    op.create_index("ix_contacts_last_name", "contacts", ["last_name"])
+    op.create_index("ix_contacts_email", "contacts", ["email"], unique=True)
+    op.create_index("ix_contacts_phone", "contacts", ["phone"], unique=True)
+    op.create_index("ix_contacts_birthday", "contacts", ["birthday"])
+    op.create_index("ix_contacts_user_id", "contacts", ["user_id"])
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=30), nullable=False),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("is_verified", sa.Boolean(), nullable=False),
+        sa.Column("avatar_url", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("username"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("users")
+    op.drop_table("contacts")
@@ -0,0 +1,55 @@
+"""Add contacts.birthday_key and users.timezone
+
+``birthday_key`` is backfilled from ``birthday`` in batches of
+``BATCH_SIZE`` rows, each committed on its own, so the table is never
+locked as a whole.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+
+BIRTHDAY_KEY_SQL = {
+    "postgresql": "CAST(EXTRACT(MONTH FROM birthday) AS INTEGER) * 100 + CAST(EXTRACT(DAY FROM birthday) AS INTEGER)",
+    "sqlite": "CAST(strftime('%m', birthday) AS INTEGER) * 100 + CAST(strftime('%d', birthday) AS INTEGER)",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("contacts", sa.Column("birthday_key", sa.Integer(), nullable=True))
+    op.add_column("users", sa.Column("timezone", sa.String(), nullable=True))
+    bind = op.get_bind()
+    expression = BIRTHDAY_KEY_SQL[bind.dialect.name]
+    if op.get_context().as_sql:
+        op.execute(f"UPDATE contacts SET birthday_key = {expression} WHERE birthday IS NOT NULL")
+        return
+    max_id = bind.execute(sa.text("SELECT MAX(id) FROM contacts")).scalar() or 0
+    with op.get_context().autocommit_block():
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            bind.execute(sa.text(
+                f"UPDATE contacts SET birthday_key = {expression} "
+                "WHERE id >= :start AND id < :end AND birthday IS NOT NULL"
+            ), {"start": start, "end": start + BATCH_SIZE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("timezone")
+    with op.batch_alter_table("contacts") as batch_op:
+        batch_op.drop_column("birthday_key")
@@ -0,0 +1,72 @@
+"""Add the contact query indexes without locking the table
+
+On Postgres every index is built with ``CREATE INDEX CONCURRENTLY`` in an
+autocommit block, so reads and writes to ``contacts`` continue during the
+build. A failed concurrent build leaves an INVALID index behind; drop it
+and rerun the upgrade.
+
+On SQLite the trigram indexes are replaced by the ``contacts_fts`` FTS5
+table and its triggers, populated from the existing rows.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from src.database.models import PG_TRGM_EXTENSION, SQLITE_FTS_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ("ix_contacts_user_id_id", ["user_id", "id"]),
+    ("ix_contacts_user_id_birthday_key", ["user_id", "birthday_key"]),
+)
+
+TRGM_COLUMNS = ("first_name", "last_name", "email")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(PG_TRGM_EXTENSION)
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "contacts", columns, if_not_exists=True,
+                            postgresql_concurrently=True)
+        if dialect == "postgresql":
+            for column in TRGM_COLUMNS:
+                op.create_index(
+                    f"ix_contacts_{column}_trgm", "contacts", [column], if_not_exists=True,
+                    postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+                    postgresql_concurrently=True)
+    if dialect == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("contacts_fts_ai", "contacts_fts_ad", "contacts_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS contacts_fts")
+    with op.get_context().autocommit_block():
+        if dialect == "postgresql":
+            for column in TRGM_COLUMNS:
+                op.drop_index(f"ix_contacts_{column}_trgm", "contacts", if_exists=True,
+                              postgresql_concurrently=True)
+        for name, _ in INDEXES:
+            op.drop_index(name, "contacts", if_exists=True,
+                          postgresql_concurrently=True)
@@ -0,0 +1,64 @@
+"""
+Rate limit policies.
+
+Routes opt in with ``dependencies=[Depends(rate_limit("<name>"))]``; the
+limits for each name are defined here so they can be reviewed and tuned in
+one place. Every policy of a route must have a token left for the request
+to pass.
+
+- ``RATE_LIMIT_ENABLED`` -- set to ``false`` to disable all limits, e.g. for load tests (default ``true``)
+"""
+import os
+from dataclasses import dataclass
+
+RATE_LIMIT_ENABLED = os.getenv(
+    "RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """
+    Token bucket holding ``limit`` tokens, refilled evenly over ``period`` seconds.
+
+    :param limit: Bucket size, i.e. the allowed burst.
+    :type limit: int
+    :param period: Seconds needed to refill an empty bucket.
+    :type period: float
+    :param per: ``user`` (falls back to the client IP for anonymous requests) or ``ip``.
+    :type per: str
+    """
+    limit: int
+    period: float
+    per: str = "ip"
+
+    @property
+    def rate(self) -> float:
+        """
+        Tokens added per second.
+        """
+        return self.limit / self.period
+
+    @classmethod
+    def parse(cls, spec: str, per: str = "ip") -> "RateLimitPolicy":
+        """
+        Build a policy from a ``"<count>/<second|minute|hour|day>"`` string.
+
+        :param spec: Limit such as ``"5/minute"``.
+        :type spec: str
+        :param per: ``user`` or ``ip``.
+        :type per: str
+        :return: Parsed policy.
+        :rtype: RateLimitPolicy
+        """
+        count, _, unit = spec.partition("/")
+        return cls(int(count), PERIODS[unit.strip()], per)
+
+
+POLICIES: dict[str, tuple[RateLimitPolicy, ...]] = {
+    "me": (
+        RateLimitPolicy.parse("5/minute", per="user"),
+        RateLimitPolicy.parse("5/minute", per="ip"),
+    ),
+}
@@ -6,7 +6,8 @@ This module defines Pydantic models for contacts and users, used for validation
 from pydantic import BaseModel, EmailStr
 from datetime import date
 from typing import Optional
-from pydantic import ConfigDict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from pydantic import ConfigDict, field_validator, model_validator
 
 from src.database.models import UserRole
 
@@ -37,6 +38,44 @@ class ContactUpdate(ContactBase):
     pass
 
 
+class ContactPatch(BaseModel):
+    """
+    Schema for a partial contact update; only the fields that were sent are changed.
+    """
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    birthday: Optional[date] = None
+    extra_data: Optional[str] = None
+
+    @model_validator(mode="after")
+    def reject_null_required_fields(self):
+        """
+        Only ``extra_data`` may be cleared with an explicit null.
+        """
+        for field in self.model_fields_set - {"extra_data"}:
+            if getattr(self, field) is None:
+                raise ValueError(f"{field} cannot be null")
+        return self
+
+
+class ContactBatchUpdate(ContactPatch):
+    """
+    One item of a batch update: the contact ID and the fields to change.
+    """
+    id: int
+
+
+class ContactBatchResult(BaseModel):
+    """
+    Outcome of one item of a batch write.
+    """
+    id: int
+    status: str
+    error: Optional[str] = None
+
+
 class ContactOut(ContactBase):
     """
     Output schema for a contact, including ID.
@@ -45,6 +84,23 @@ class ContactOut(ContactBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ContactImportError(BaseModel):
+    """
+    A row of an import file that could not be imported.
+    """
+    row: int
+    error: str
+
+
+class ContactImportResult(BaseModel):
+    """
+    Summary of a bulk contact import.
+    """
+    imported: int
+    failed: int
+    errors: list[ContactImportError]
+
+
 class UserCreate(BaseModel):
     """
     Schema for creating a new user.
@@ -52,6 +108,21 @@ class UserCreate(BaseModel):
     username: str
     password: str
     role: str = "USER"
+    timezone: Optional[str] = None
+
+    @field_validator("timezone")
+    @classmethod
+    def validate_timezone(cls, value: Optional[str]) -> Optional[str]:
+        """
+        Ensure the timezone is a known IANA name such as ``Europe/Kyiv``.
+        """
+        if value is None:
+            return value
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {value}")
+        return value
 
 
 class UserRead(BaseModel):
@@ -61,9 +132,21 @@ class UserRead(BaseModel):
     id: int
     username: str
     role: str
+    timezone: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
 
+class AvatarJob(BaseModel):
+    """
+    Status of a background avatar upload.
+    """
+    job_id: str
+    status: str
+    avatar_url: Optional[str] = None
+    variants: Optional[dict[str, str]] = None
+    error: Optional[str] = None
+
+
 class PasswordResetRequest(BaseModel):
     email: str
 
@@ -14,7 +14,7 @@ OPENAPI_KWARGS = dict(
     title="Contacts REST API",
     description=(
         "FastAPI + SQLAlchemy + PostgreSQL.\n\n"
-        "Features: CRUD, search by first/last name or email, upcoming birthdays (7 days)."
+        "Features: CRUD, search by first/last name or email, upcoming birthdays (7 days by default)."
     ),
     version="1.0.0",
     openapi_tags=tags_metadata,
@@ -1,7 +1,41 @@
+import calendar
+from collections import defaultdict
+from sqlalchemy import bindparam, case, column, delete, func, insert, literal_column, or_, select, table, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from src.database.models import Contact
-from src.configuration.schemas import ContactCreate, ContactUpdate
+from src.database.models import Contact, birthday_key
+from src.configuration.schemas import ContactBatchUpdate, ContactCreate, ContactPatch, ContactUpdate
 from datetime import date, timedelta
+import base64
+import binascii
+
+CHANGED_OWNERS_KEY = "contacts_changed_owners"
+
+# Largest value of the INTEGER primary key
+MAX_CONTACT_ID = 2**31 - 1
+
+# Columns of ``ContactOut``, in its field order
+CONTACT_COLUMNS = ("id", "first_name", "last_name", "email",
+                   "phone", "birthday", "extra_data")
+
+
+def _mark_changed(db: Session, user_id: int) -> None:
+    """
+    Record in ``db.info`` that a user's contacts were written, so cached reads can be invalidated.
+    """
+    db.info.setdefault(CHANGED_OWNERS_KEY, set()).add(user_id)
+
+
+def _select_contacts(user_id: int):
+    """
+    Start a read-only SELECT of a user's contacts over :data:`CONTACT_COLUMNS`.
+
+    Executing it yields plain ``Row`` tuples with attribute access instead of
+    ``Contact`` instances, so reads skip ORM hydration, the identity map and
+    state tracking, and load only the columns responses need.
+    """
+    return select(*(getattr(Contact, name) for name in CONTACT_COLUMNS)).where(Contact.user_id == user_id)
 
 
 def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100):
@@ -16,10 +50,113 @@ def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     :type skip: int
     :param limit: Maximum number of records to return.
     :type limit: int
-    :return: List of Contact objects.
-    :rtype: list
+    :return: Rows over :data:`CONTACT_COLUMNS`.
+    :rtype: list[Row]
+    """
+    return db.execute(_select_contacts(user_id).order_by(Contact.id).offset(skip).limit(limit)).all()
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    Encode a contact ID into an opaque pagination cursor.
+
+    :param contact_id: ID of the last contact on the current page.
+    :type contact_id: int
+    :return: URL-safe cursor string.
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(f"c:{contact_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
     """
-    return db.query(Contact).filter(Contact.user_id == user_id).offset(skip).limit(limit).all()
+    Decode an opaque pagination cursor back into a contact ID.
+
+    :param cursor: Cursor previously returned by :func:`encode_cursor`.
+    :type cursor: str
+    :return: ID of the last contact seen by the client.
+    :rtype: int
+    :raises ValueError: If the cursor is malformed or the ID is outside the ``id`` column's range.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    prefix, _, value = raw.partition(":")
+    if prefix != "c" or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    contact_id = int(value)
+    if not 1 <= contact_id <= MAX_CONTACT_ID:
+        raise ValueError("Invalid cursor")
+    return contact_id
+
+
+def get_contacts_after(db: Session, user_id: int, after_id: int | None = None, limit: int = 100):
+    """
+    Retrieve a page of contacts for a user using keyset pagination.
+
+    Seeks directly to ``after_id`` through the ``(user_id, id)`` index, so the
+    cost of a page does not grow with its depth.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param after_id: ID of the last contact of the previous page, or None for the first page.
+    :type after_id: int, optional
+    :param limit: Maximum number of records to return.
+    :type limit: int
+    :return: Rows over :data:`CONTACT_COLUMNS` and the cursor of the next page (None on the last page).
+    :rtype: tuple[list[Row], str | None]
+    """
+    if limit <= 0:
+        return [], None
+    query = _select_contacts(user_id)
+    if after_id is not None:
+        query = query.where(Contact.id > after_id)
+    # Fetch one extra row to know whether another page exists
+    contacts = db.execute(query.order_by(Contact.id).limit(limit + 1)).all()
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        return contacts, encode_cursor(contacts[-1].id)
+    return contacts, None
+
+
+EXPORT_COLUMNS = CONTACT_COLUMNS
+
+
+def export_contacts_statement(user_id: int, batch_size: int = 1000):
+    """
+    Build the streaming SELECT used to export all contacts of a user.
+
+    ``yield_per`` makes the driver use a server-side cursor and fetch
+    ``batch_size`` rows at a time instead of buffering the whole result.
+
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param batch_size: Number of rows fetched per round trip.
+    :type batch_size: int
+    :return: Select statement over :data:`EXPORT_COLUMNS` ordered by ID.
+    :rtype: Select
+    """
+    return select(*(getattr(Contact, name) for name in EXPORT_COLUMNS)).where(
+        Contact.user_id == user_id).order_by(Contact.id).execution_options(yield_per=batch_size)
+
+
+def iter_contacts(db: Session, user_id: int, batch_size: int = 1000):
+    """
+    Stream all contacts of a user in batches through a server-side cursor.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param batch_size: Number of rows fetched per round trip.
+    :type batch_size: int
+    :return: Generator of row batches.
+    :rtype: Iterator[list[Row]]
+    """
+    yield from db.execute(export_contacts_statement(user_id, batch_size)).partitions()
 
 
 def get_contact(db: Session, contact_id: int, user_id: int):
@@ -40,7 +177,7 @@ def get_contact(db: Session, contact_id: int, user_id: int):
 
 def create_contact(db: Session, contact: ContactCreate, user_id: int):
     """
-    Create a new contact for a user.
+    Create a new contact for a user with a single ``INSERT ... RETURNING``.
 
     :param db: SQLAlchemy session.
     :type db: Session
@@ -48,45 +185,128 @@ def create_contact(db: Session, contact: ContactCreate, user_id: int):
     :type contact: ContactCreate
     :param user_id: ID of the user.
     :type user_id: int
-    :return: The created Contact object.
-    :rtype: Contact
+    :return: The created contact row.
+    :rtype: Row
     """
-    db_contact = Contact(**contact.model_dump(), user_id=user_id)
-    db.add(db_contact)
+    values = {**contact.model_dump(), "user_id": user_id,
+              "birthday_key": birthday_key(contact.birthday)}
+    contacts = Contact.__table__
+    row = db.execute(insert(contacts).values(values).returning(*contacts.c)).one()
     db.commit()
-    db.refresh(db_contact)
-    return db_contact
+    _mark_changed(db, user_id)
+    return row
 
 
-def update_contact(db: Session, contact_id: int, contact: ContactUpdate, user_id: int):
+def _insert_ignoring_conflicts(db: Session):
     """
-    Update an existing contact for a user.
+    Build a multi-row INSERT that skips rows violating a unique constraint.
+
+    :return: Insert statement, or None if the dialect has no ON CONFLICT support.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(Contact).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(Contact).on_conflict_do_nothing()
+    return None
+
+
+def bulk_create_contacts(db: Session, contacts: list[ContactCreate], user_id: int) -> list[str | None]:
+    """
+    Create many contacts for a user in one multi-row INSERT.
+
+    Rows whose email or phone is already taken (in the database or earlier in
+    the same batch) are skipped and reported instead of aborting the batch.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param contacts: Validated contacts to create.
+    :type contacts: list[ContactCreate]
+    :param user_id: ID of the user.
+    :type user_id: int
+    :return: One entry per input contact: None if created, otherwise the error message.
+    :rtype: list[str | None]
+    """
+    if not contacts:
+        return []
+    emails = {contact.email for contact in contacts}
+    phones = {contact.phone for contact in contacts}
+    taken = db.execute(select(Contact.email, Contact.phone).where(
+        or_(Contact.email.in_(emails), Contact.phone.in_(phones)))).all()
+    taken_emails = {row.email for row in taken}
+    taken_phones = {row.phone for row in taken}
+    results = [None] * len(contacts)
+    pending = []
+    for index, contact in enumerate(contacts):
+        if contact.email in taken_emails:
+            results[index] = f"Email already exists: {contact.email}"
+        elif contact.phone in taken_phones:
+            results[index] = f"Phone already exists: {contact.phone}"
+        else:
+            taken_emails.add(contact.email)
+            taken_phones.add(contact.phone)
+            pending.append((index, {**contact.model_dump(), "user_id": user_id,
+                                    "birthday_key": birthday_key(contact.birthday)}))
+    if not pending:
+        return results
+    stmt = _insert_ignoring_conflicts(db)
+    if stmt is not None:
+        # Rows lost to a concurrent insert are simply not returned
+        inserted = set(db.scalars(stmt.values(
+            [values for _, values in pending]).returning(Contact.email)))
+    else:
+        inserted = set()
+        for _, values in pending:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Contact).values(values))
+                inserted.add(values["email"])
+            except IntegrityError:
+                pass
+    db.commit()
+    _mark_changed(db, user_id)
+    for index, values in pending:
+        if values["email"] not in inserted:
+            results[index] = "Email or phone already exists"
+    return results
+
+
+def update_contact(db: Session, contact_id: int, contact: ContactUpdate | ContactPatch, user_id: int):
+    """
+    Update an existing contact for a user with a single ``UPDATE ... RETURNING``.
+
+    A ``ContactPatch`` changes only the fields that were sent; a
+    ``ContactUpdate`` rewrites the whole record.
 
     :param db: SQLAlchemy session.
     :type db: Session
     :param contact_id: ID of the contact.
     :type contact_id: int
-    :param contact: Contact update schema.
-    :type contact: ContactUpdate
+    :param contact: Full or partial contact update.
+    :type contact: ContactUpdate | ContactPatch
     :param user_id: ID of the user.
     :type user_id: int
-    :return: Updated Contact object or None if not found.
-    :rtype: Contact or None
+    :return: Updated contact row or None if not found.
+    :rtype: Row or None
     """
-    db_contact = db.query(Contact).filter(
-        Contact.id == contact_id, Contact.user_id == user_id).first()
-    if not db_contact:
-        return None
-    for field, value in contact.model_dump().items():
-        setattr(db_contact, field, value)
+    values = contact.model_dump(exclude_unset=isinstance(contact, ContactPatch))
+    if not values:
+        return get_contact(db, contact_id, user_id)
+    if "birthday" in values:
+        values["birthday_key"] = birthday_key(values["birthday"])
+    contacts = Contact.__table__
+    row = db.execute(update(contacts).where(
+        contacts.c.id == contact_id, contacts.c.user_id == user_id
+    ).values(values).returning(*contacts.c)).one_or_none()
     db.commit()
-    db.refresh(db_contact)
-    return db_contact
+    if row is not None:
+        _mark_changed(db, user_id)
+    return row
 
 
 def delete_contact(db: Session, contact_id: int, user_id: int):
     """
-    Delete a contact for a user.
+    Delete a contact for a user with a single ``DELETE ... RETURNING``.
 
     :param db: SQLAlchemy session.
     :type db: Session
@@ -94,21 +314,177 @@ def delete_contact(db: Session, contact_id: int, user_id: int):
     :type contact_id: int
     :param user_id: ID of the user.
     :type user_id: int
-    :return: Deleted Contact object or None if not found.
-    :rtype: Contact or None
+    :return: Deleted contact row or None if not found.
+    :rtype: Row or None
+    """
+    contacts = Contact.__table__
+    row = db.execute(delete(contacts).where(
+        contacts.c.id == contact_id, contacts.c.user_id == user_id
+    ).returning(*contacts.c)).one_or_none()
+    db.commit()
+    if row is not None:
+        _mark_changed(db, user_id)
+    return row
+
+
+def batch_update_contacts(db: Session, changes: list[ContactBatchUpdate], user_id: int) -> list[dict]:
+    """
+    Apply partial updates to many contacts of a user in one transaction.
+
+    Changes touching the same set of fields share one statement: a single
+    ``UPDATE ... WHERE id IN (...)`` when the values are identical, otherwise
+    one executemany. Items for unknown IDs, repeated IDs or an email/phone
+    already used by another contact are skipped and reported.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param changes: Contact IDs with the fields to change.
+    :type changes: list[ContactBatchUpdate]
+    :param user_id: ID of the user.
+    :type user_id: int
+    :return: One ``{"id", "status", "error"}`` dict per change, status ``updated``, ``not_found`` or ``conflict``.
+    :rtype: list[dict]
+    """
+    if not changes:
+        return []
+    owned = set(db.scalars(select(Contact.id).where(
+        Contact.user_id == user_id, Contact.id.in_({change.id for change in changes}))))
+    emails = {change.email for change in changes if change.email is not None}
+    phones = {change.phone for change in changes if change.phone is not None}
+    holders = db.execute(select(Contact.id, Contact.email, Contact.phone).where(
+        or_(Contact.email.in_(emails), Contact.phone.in_(phones)))).all() if emails or phones else []
+    email_holder = {row.email: row.id for row in holders}
+    phone_holder = {row.phone: row.id for row in holders}
+    results = []
+    seen = set()
+    groups = defaultdict(list)
+    for change in changes:
+        values = change.model_dump(exclude_unset=True, exclude={"id"})
+        error = None
+        if change.id not in owned:
+            results.append({"id": change.id, "status": "not_found", "error": None})
+            continue
+        if change.id in seen:
+            error = "Contact appears more than once in the batch"
+        elif "email" in values and email_holder.get(values["email"], change.id) != change.id:
+            error = f"Email already exists: {values['email']}"
+        elif "phone" in values and phone_holder.get(values["phone"], change.id) != change.id:
+            error = f"Phone already exists: {values['phone']}"
+        seen.add(change.id)
+        if error:
+            results.append({"id": change.id, "status": "conflict", "error": error})
+            continue
+        # Only accepted items claim their email and phone
+        if "email" in values:
+            email_holder[values["email"]] = change.id
+        if "phone" in values:
+            phone_holder[values["phone"]] = change.id
+        results.append({"id": change.id, "status": "updated", "error": None})
+        if not values:
+            continue
+        if "birthday" in values:
+            values["birthday_key"] = birthday_key(values["birthday"])
+        groups[tuple(sorted(values))].append((change.id, values))
+    contacts = Contact.__table__
+    for fields, items in groups.items():
+        first = items[0][1]
+        if all(values == first for _, values in items):
+            db.execute(update(contacts).where(
+                contacts.c.user_id == user_id,
+                contacts.c.id.in_([contact_id for contact_id, _ in items])).values(first))
+        else:
+            stmt = update(contacts).where(
+                contacts.c.user_id == user_id, contacts.c.id == bindparam("b_id")
+            ).values({field: bindparam(f"b_{field}") for field in fields})
+            db.execute(stmt, [{"b_id": contact_id, **{f"b_{field}": value for field, value in values.items()}}
+                              for contact_id, values in items])
+    db.commit()
+    if groups:
+        _mark_changed(db, user_id)
+    return results
+
+
+def batch_delete_contacts(db: Session, contact_ids: list[int], user_id: int) -> list[dict]:
+    """
+    Delete many contacts of a user with a single ``DELETE ... RETURNING``.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param contact_ids: IDs of the contacts.
+    :type contact_ids: list[int]
+    :param user_id: ID of the user.
+    :type user_id: int
+    :return: One ``{"id", "status", "error"}`` dict per ID, status ``deleted``, ``not_found``
+        or ``conflict`` for repeats of an ID.
+    :rtype: list[dict]
     """
-    db_contact = db.query(Contact).filter(
-        Contact.id == contact_id, Contact.user_id == user_id).first()
-    if db_contact:
-        db.delete(db_contact)
-        db.commit()
-    return db_contact
+    if not contact_ids:
+        return []
+    deleted = set(db.scalars(delete(Contact).where(
+        Contact.user_id == user_id, Contact.id.in_(set(contact_ids))
+    ).returning(Contact.id).execution_options(synchronize_session=False)))
+    db.commit()
+    if deleted:
+        _mark_changed(db, user_id)
+    results = []
+    seen = set()
+    for contact_id in contact_ids:
+        if contact_id in seen:
+            results.append({"id": contact_id, "status": "conflict",
+                            "error": "Contact appears more than once in the batch"})
+            continue
+        seen.add(contact_id)
+        results.append({"id": contact_id, "status": "deleted" if contact_id in deleted else "not_found",
+                        "error": None})
+    return results
 
 
-def search_contacts(db: Session, user_id: int, first_name: str = None, last_name: str = None, email: str = None):
+def _fts_phrase(term: str) -> str:
+    """
+    Quote a user-supplied term as an FTS5 phrase so it is matched literally.
+    """
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _rank_by_relevance(db: Session, query, q: str):
+    """
+    Filter a contact SELECT by a free-text term and order it by relevance.
+
+    Uses ``pg_trgm`` similarity on Postgres and the FTS5 trigram table on
+    SQLite; terms shorter than a trigram fall back to ILIKE with prefix
+    matches ranked first.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query = query.where(or_(Contact.first_name.ilike(f"%{q}%"),
+                                 Contact.last_name.ilike(f"%{q}%"),
+                                 Contact.email.ilike(f"%{q}%")))
+        return query.order_by(func.greatest(func.similarity(Contact.first_name, q),
+                                            func.similarity(Contact.last_name, q),
+                                            func.similarity(Contact.email, q)).desc(),
+                              Contact.id)
+    if dialect == "sqlite" and len(q) >= 3:
+        fts = table("contacts_fts", column("rowid"), column("rank"))
+        return query.join(fts, fts.c.rowid == Contact.id).where(
+            literal_column("contacts_fts").op("MATCH")(_fts_phrase(q))
+        ).order_by(fts.c.rank, Contact.id)
+    query = query.where(or_(Contact.first_name.ilike(f"%{q}%"),
+                             Contact.last_name.ilike(f"%{q}%"),
+                             Contact.email.ilike(f"%{q}%")))
+    prefix_match = or_(Contact.first_name.ilike(f"{q}%"),
+                       Contact.last_name.ilike(f"{q}%"),
+                       Contact.email.ilike(f"{q}%"))
+    return query.order_by(case((prefix_match, 0), else_=1), Contact.id)
+
+
+def search_contacts(db: Session, user_id: int, first_name: str = None, last_name: str = None, email: str = None, q: str = None, limit: int = 100):
     """
     Search contacts by first name, last name, or email for a user.
 
+    Field filters are substring matches served by the trigram indexes on
+    Postgres. ``q`` matches any of the three fields and orders the results
+    by relevance.
+
     :param db: SQLAlchemy session.
     :type db: Session
     :param user_id: ID of the user.
@@ -119,33 +495,59 @@ def search_contacts(db: Session, user_id: int, first_name: str = None, last_name
     :type last_name: str, optional
     :param email: Email to search.
     :type email: str, optional
-    :return: List of matching Contact objects.
-    :rtype: list
+    :param q: Free-text term matched against all searchable fields.
+    :type q: str, optional
+    :param limit: Maximum number of records to return.
+    :type limit: int
+    :return: Matching rows over :data:`CONTACT_COLUMNS`.
+    :rtype: list[Row]
     """
-    query = db.query(Contact).filter(Contact.user_id == user_id)
+    query = _select_contacts(user_id)
     if first_name:
-        query = query.filter(Contact.first_name.ilike(f"%{first_name}%"))
+        query = query.where(Contact.first_name.ilike(f"%{first_name}%"))
     if last_name:
-        query = query.filter(Contact.last_name.ilike(f"%{last_name}%"))
+        query = query.where(Contact.last_name.ilike(f"%{last_name}%"))
     if email:
-        query = query.filter(Contact.email.ilike(f"%{email}%"))
-    return query.all()
+        query = query.where(Contact.email.ilike(f"%{email}%"))
+    if q:
+        query = _rank_by_relevance(db, query, q)
+    else:
+        query = query.order_by(Contact.id)
+    return db.execute(query.limit(limit)).all()
 
 
-def get_upcoming_birthdays(db: Session, user_id: int):
+def get_upcoming_birthdays(db: Session, user_id: int, days: int = 7, today: date | None = None):
     """
-    Get contacts with upcoming birthdays in the next 7 days for a user.
+    Get contacts with birthdays in the next ``days`` days for a user.
+
+    Matches on the indexed month-day ``birthday_key`` instead of the full birth
+    date, so any birth year qualifies. A window that crosses New Year is split
+    into two key ranges, and people born on February 29th are included on
+    February 28th in non-leap years.
 
     :param db: SQLAlchemy session.
     :type db: Session
     :param user_id: ID of the user.
     :type user_id: int
-    :return: List of Contact objects with upcoming birthdays.
-    :rtype: list
-    """
-    today = date.today()
-    next_week = today + timedelta(days=7)
-    return db.query(Contact).filter(
-        Contact.user_id == user_id,
-        Contact.birthday.between(today, next_week)
-    ).all()
+    :param days: Size of the window in days, including today.
+    :type days: int
+    :param today: First day of the window, defaults to the server's current date.
+    :type today: date, optional
+    :return: Rows over :data:`CONTACT_COLUMNS` ordered by the next birthday.
+    :rtype: list[Row]
+    """
+    today = today or date.today()
+    end = today + timedelta(days=days)
+    start_key = birthday_key(today)
+    end_key = birthday_key(end)
+    if end_key == 228 and not calendar.isleap(end.year):
+        end_key = 229
+    if end.year == today.year:
+        window = Contact.birthday_key.between(start_key, end_key)
+    else:
+        window = or_(Contact.birthday_key.between(start_key, 1231),
+                     Contact.birthday_key.between(101, end_key))
+    return db.execute(_select_contacts(user_id).where(window).order_by(
+        case((Contact.birthday_key >= start_key, 0), else_=1),
+        Contact.birthday_key
+    )).all()
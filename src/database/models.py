@@ -3,12 +3,32 @@ SQLAlchemy models for contacts and users.
 
 Defines database tables and user roles for the application.
 """
+from datetime import date
 from enum import Enum, auto
-from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy import Column, Integer, String, Date, Index, DDL, event
 from src.database.session import Base
 from sqlalchemy import String
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
+from sqlalchemy.orm import validates
+
+
+def birthday_key(birthday: date | None) -> int | None:
+    """
+    Build the year-agnostic month-day key of a birthday.
+
+    The key is ``month * 100 + day`` (e.g. 1231 for December 31st), so
+    calendar order matches integer order and a date window maps to one or two
+    integer ranges.
+
+    :param birthday: Birth date.
+    :type birthday: date, optional
+    :return: Month-day key or None if no birthday is set.
+    :rtype: int or None
+    """
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
 
 
 class Contact(Base):
@@ -23,9 +43,61 @@ class Contact(Base):
     email = Column(String, unique=True, index=True)
     phone = Column(String, unique=True, index=True)
     birthday = Column(Date, index=True)
+    birthday_key = Column(Integer, nullable=True)  # month * 100 + day
     extra_data = Column(String, nullable=True)
     user_id = Column(Integer, index=True)  # owner id
 
+    __table_args__ = (
+        # Serves keyset pagination: WHERE user_id = ? AND id > ? ORDER BY id
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        # Serves upcoming birthdays: WHERE user_id = ? AND birthday_key BETWEEN ? AND ?
+        Index("ix_contacts_user_id_birthday_key", "user_id", "birthday_key"),
+        # Trigram GIN indexes serve ILIKE '%term%' and similarity() on Postgres
+        *(
+            Index(f"ix_contacts_{name}_trgm", name, postgresql_using="gin",
+                  postgresql_ops={name: "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+            for name in ("first_name", "last_name", "email")
+        ),
+    )
+
+    @validates("birthday")
+    def _sync_birthday_key(self, key, value):
+        """
+        Keep ``birthday_key`` in step with ``birthday``.
+        """
+        self.birthday_key = birthday_key(value)
+        return value
+
+
+PG_TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+# SQLite counterpart of the trigram indexes: an external-content FTS5 table
+# kept in sync with ``contacts`` by triggers.
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, content='contacts', content_rowid='id', "
+    "tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+)
+
+event.listen(Contact.__table__, "before_create",
+             DDL(PG_TRGM_EXTENSION).execute_if(dialect="postgresql"))
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Contact.__table__, "after_create",
+                 DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
+
 
 class UserRole:
     """
@@ -47,6 +119,7 @@ class User(Base):
     role: Mapped[str] = mapped_column(String, default=UserRole.USER)
     is_verified: Mapped[bool] = mapped_column(default=False)
     avatar_url: Mapped[str] = mapped_column(String, nullable=True)
+    timezone: Mapped[str] = mapped_column(String, nullable=True)
 
     def __repr__(self) -> str:
         """
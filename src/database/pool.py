@@ -0,0 +1,225 @@
+"""
+Connection pool configuration and instrumentation.
+
+Pool sizing and the pre-ping strategy are read from the environment:
+
+- ``DB_POOL_SIZE`` -- persistent connections per engine (default 5)
+- ``DB_MAX_OVERFLOW`` -- extra connections allowed under burst (default 10)
+- ``DB_POOL_TIMEOUT`` -- seconds to wait for a free connection (default 30)
+- ``DB_POOL_RECYCLE`` -- max connection age in seconds, -1 disables (default 1800)
+- ``DB_POOL_PRE_PING`` -- ``always``, ``idle`` or ``never`` (default ``idle``)
+- ``DB_POOL_PING_IDLE_SECONDS`` -- idle time before ``idle`` pings (default 30)
+
+Every engine gets a :class:`PoolStats` collecting checkout wait times,
+connections in use, overflow and invalidations.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle").lower()
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+if DB_POOL_PRE_PING not in PRE_PING_STRATEGIES:
+    raise ValueError(
+        f"DB_POOL_PRE_PING must be one of {PRE_PING_STRATEGIES}, got {DB_POOL_PRE_PING!r}")
+
+
+class PoolStats:
+    """
+    Thread-safe counters describing the behaviour of one connection pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.peak_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        """
+        Record how long a checkout waited for a connection.
+
+        :param seconds: Time spent inside the pool's checkout.
+        :type seconds: float
+        """
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """
+        Increment one of the integer counters.
+
+        :param counter: Attribute name of the counter.
+        :type counter: str
+        :param amount: Value to add.
+        :type amount: int
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_checkout(self) -> None:
+        """
+        Count a checkout and update the peak of connections in use.
+        """
+        pool = self.pool
+        checked_out = pool.checkedout() if hasattr(pool, "checkedout") else None
+        with self._lock:
+            self.checkouts += 1
+            if checked_out is not None:
+                self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def snapshot(self) -> dict:
+        """
+        Return the current counters together with live pool gauges.
+
+        :return: Pool statistics.
+        :rtype: dict
+        """
+        pool = self.pool
+        checked_out = pool.checkedout() if hasattr(pool, "checkedout") else None
+        with self._lock:
+            return {
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "size": pool.size() if pool is not None else None,
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "pings": self.pings,
+                "wait_count": self.wait_count,
+                "wait_avg_ms": self.wait_total / self.wait_count * 1000 if self.wait_count else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+class _TimedPoolMixin:
+    """
+    Measures how long ``_do_get`` blocks waiting for a free connection.
+    """
+    stats: PoolStats | None = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.increment("timeouts")
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - start)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        if self.stats is not None:
+            self.stats.pool = pool
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """
+    QueuePool that reports checkout wait times to :class:`PoolStats`.
+    """
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """
+    Async-adapted QueuePool that reports checkout wait times to :class:`PoolStats`.
+    """
+
+
+POOL_STATS = {"sync": PoolStats(), "async": PoolStats()}
+
+
+def pool_options(url: str, is_async: bool = False) -> dict:
+    """
+    Build ``create_engine`` pool arguments for a database URL.
+
+    SQLite keeps SQLAlchemy's default pool, which does not accept sizing arguments.
+
+    :param url: Database URL.
+    :type url: str
+    :param is_async: Whether the options are for an async engine.
+    :type is_async: bool
+    :return: Keyword arguments for ``create_engine``/``create_async_engine``.
+    :rtype: dict
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+    }
+
+
+def instrument(engine: Engine, stats: PoolStats) -> None:
+    """
+    Attach pool event listeners and the ``idle`` pre-ping strategy to an engine.
+
+    With ``DB_POOL_PRE_PING=idle`` a connection is only pinged on checkout when
+    it sat unused in the pool for longer than ``DB_POOL_PING_IDLE_SECONDS``;
+    a failed ping makes the pool discard it and hand out a fresh connection.
+
+    :param engine: Synchronous engine (``AsyncEngine.sync_engine`` for async engines).
+    :type engine: Engine
+    :param stats: Statistics object to update.
+    :type stats: PoolStats
+    """
+    pool = engine.pool
+    stats.pool = pool
+    if isinstance(pool, _TimedPoolMixin):
+        pool.stats = stats
+    ping_idle = DB_POOL_PRE_PING == "idle"
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.increment("connects")
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+        last_checkin = connection_record.info.get("last_checkin")
+        if ping_idle and last_checkin is not None and \
+                time.monotonic() - last_checkin > DB_POOL_PING_IDLE_SECONDS:
+            stats.increment("pings")
+            try:
+                engine.dialect.do_ping(dbapi_connection)
+            except Exception as ping_error:
+                raise exc.DisconnectionError() from ping_error
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment("invalidations")
@@ -0,0 +1,199 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor execution events of the engines are timed and charged to the
+request being served, which :class:`QueryStatsMiddleware` tracks in a
+context variable (the threadpool and the async driver both run queries in
+a copy of the request's context). For every request it:
+
+- adds ``X-DB-Query-Count`` and ``X-DB-Time`` (milliseconds) response headers in debug mode
+- logs a JSON line for every statement slower than ``DB_SLOW_QUERY_MS``
+- logs a JSON line when one statement shape ran ``DB_REPEATED_QUERY_THRESHOLD``
+  times or more, the signature of an N+1 query pattern
+
+Statement shapes are the SQL text with ``IN`` lists collapsed, so the same
+query with different parameters counts as one shape. Parameters are never
+logged.
+
+- ``DEBUG`` -- ``true`` adds the headers (default ``false``)
+- ``DB_SLOW_QUERY_MS`` -- slow statement threshold, 0 disables (default 200)
+- ``DB_REPEATED_QUERY_THRESHOLD`` -- executions of one shape per request that are flagged, 0 disables (default 10)
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "10"))
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so executions with different parameters compare equal.
+
+    :param statement: SQL sent to the driver.
+    :type statement: str
+    :return: Statement with ``IN`` lists reduced to one placeholder and whitespace collapsed.
+    :rtype: str
+    """
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestQueries:
+    """
+    Statements executed while serving one request.
+
+    :param scope: ASGI scope of the request.
+    :type scope: dict
+    """
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        """
+        Charge one statement to the request.
+
+        :param statement: SQL sent to the driver.
+        :type statement: str
+        :param seconds: Execution time.
+        :type seconds: float
+        """
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[shape] += 1
+
+    def route(self) -> str:
+        """
+        Route template of the request, or its path before routing.
+        """
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_current: contextvars.ContextVar[RequestQueries | None] = contextvars.ContextVar(
+    "request_queries", default=None)
+
+
+class QueryTotals:
+    """
+    Thread-safe counters of this worker, exported by ``src.services.metrics``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.slow_queries = 0
+        self.repeated_statements = 0
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self) -> dict:
+        """
+        Return the current counters.
+
+        :return: Executed statements, slow statements and flagged repeated shapes.
+        :rtype: dict
+        """
+        with self._lock:
+            return {"queries": self.queries, "slow_queries": self.slow_queries,
+                    "repeated_statements": self.repeated_statements}
+
+
+QUERY_TOTALS = QueryTotals()
+
+
+def _log(event_name: str, **fields) -> None:
+    logger.warning(json.dumps({"event": event_name, **fields}))
+
+
+def instrument_queries(engine: Engine) -> None:
+    """
+    Time every cursor execution of an engine.
+
+    :param engine: Synchronous engine (``AsyncEngine.sync_engine`` for async engines).
+    :type engine: Engine
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        QUERY_TOTALS.increment("queries")
+        queries = _current.get()
+        if queries is not None:
+            queries.record(statement, seconds)
+        if DB_SLOW_QUERY_MS and seconds * 1000 >= DB_SLOW_QUERY_MS:
+            QUERY_TOTALS.increment("slow_queries")
+            _log("slow_query", duration_ms=round(seconds * 1000, 2),
+                 route=queries.route() if queries is not None else None,
+                 executemany=executemany, statement=statement_shape(statement)[:1000])
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware tracking the statements of each request.
+
+    :param app: Wrapped ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries(scope)
+        token = _current.set(queries)
+
+        async def send_with_headers(message):
+            if DEBUG and message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-query-count", str(queries.count).encode()),
+                    (b"x-db-time", f"{queries.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            if DB_REPEATED_QUERY_THRESHOLD:
+                for shape, executions in queries.shapes.items():
+                    if executions >= DB_REPEATED_QUERY_THRESHOLD:
+                        QUERY_TOTALS.increment("repeated_statements")
+                        _log("repeated_query", route=queries.route(), method=scope["method"],
+                             executions=executions, statement=shape[:1000])
@@ -1,14 +1,14 @@
 """
 User repository functions for database operations.
 
-Provides functions to create and retrieve users from the database.
+Provides functions to create, retrieve and update users in the database.
 """
 from sqlalchemy.orm import Session
 
 from src.database.models import User, UserRole
 
 
-def create_user(db: Session, username: str, hashed_password: str, role: str) -> User:
+def create_user(db: Session, username: str, hashed_password: str, role: str, timezone: str | None = None) -> User:
     """
     Create a new user in the database.
 
@@ -20,10 +20,13 @@ def create_user(db: Session, username: str, hashed_password: str, role: str) ->
     :type hashed_password: str
     :param role: Role of the user.
     :type role: UserRole
+    :param timezone: IANA timezone name of the user.
+    :type timezone: str, optional
     :return: The created User object.
     :rtype: User
     """
-    user = User(username=username, password=hashed_password, role=role)
+    user = User(username=username, password=hashed_password,
+                role=role, timezone=timezone)
     db.add(user)
     db.commit()
     db.refresh(user)
@@ -42,3 +45,48 @@ def get_user_by_username(db: Session, username: str) -> User | None:
     :rtype: User or None
     """
     return db.query(User).filter(User.username == username).first()
+
+
+def update_password(db: Session, user_id: int, hashed_password: str) -> None:
+    """
+    Replace the stored password hash of a user.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param hashed_password: New hashed password.
+    :type hashed_password: str
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.password: hashed_password})
+    db.commit()
+
+
+def set_verified(db: Session, user_id: int) -> None:
+    """
+    Mark a user's email as verified.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param user_id: ID of the user.
+    :type user_id: int
+    """
+    db.query(User).filter(User.id == user_id).update({User.is_verified: True})
+    db.commit()
+
+
+def update_avatar_url(db: Session, user_id: int, avatar_url: str) -> None:
+    """
+    Store a new avatar URL for a user.
+
+    :param db: SQLAlchemy session.
+    :type db: Session
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param avatar_url: Public URL of the avatar image.
+    :type avatar_url: str
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.avatar_url: avatar_url})
+    db.commit()
@@ -1,57 +1,148 @@
-
 """
 Main FastAPI application module.
 
 This module initializes the FastAPI app, configures middleware, exception handlers, and includes routers for authentication, user, and contact management.
 
+Importing it does no I/O: :func:`create_app` builds the application and its
+lifespan opens the database and Redis connections before the first request
+is served. ``app`` is the default instance used by ``uvicorn src.main:app``.
+
 :author: DimaKisiv
 """
+import asyncio
+import contextlib
+import logging
 import os
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
+from sqlalchemy import text
 from src.configuration.swagger_config import OPENAPI_KWARGS
 from src.database.models import Base
-from src.database.session import engine
+from src.database.query_stats import QueryStatsMiddleware
+from src.database.session import dispose_engines, get_async_engine, get_engine
+from src.security import oauth
+from src.security.passwords import HashingQueueFull, shutdown_executor
+from src.services import avatar_pipeline
+from src.services.metrics import METRICS_ENABLED, MetricsMiddleware
+from src.services.tracing import TracingMiddleware, get_exporter, instrument_routes
+
+from src.routers import auth, users, contacts, internal, media, metrics
+
+# create_all: create missing tables at startup (development, tests)
+# migrations: the schema is managed with ``alembic upgrade head``; nothing is created
+DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "create_all").lower()
+if DB_SCHEMA_MODE not in ("create_all", "migrations"):
+    raise ValueError(
+        f"DB_SCHEMA_MODE must be create_all or migrations, got {DB_SCHEMA_MODE!r}")
+
+STARTUP_REDIS_TIMEOUT = float(os.getenv("STARTUP_REDIS_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+def _ping_sync_engine() -> None:
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
 
-from src.routers import auth, users, contacts
+async def warm_up() -> None:
+    """
+    Prepare the worker's connections before it accepts requests.
 
-Base.metadata.create_all(bind=engine)
+    Creates the tables when ``DB_SCHEMA_MODE`` is ``create_all`` and opens a
+    first connection of the engine that serves requests, so a database
+    outage fails the startup instead of the first request. Redis is pinged
+    too; as the rate limiter and caches degrade without it, a failure is
+    only logged.
+    """
+    if DB_SCHEMA_MODE == "create_all":
+        await run_in_threadpool(Base.metadata.create_all, bind=get_engine())
+    async_engine = get_async_engine()
+    if async_engine is None:
+        await run_in_threadpool(_ping_sync_engine)
+    else:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    try:
+        await asyncio.wait_for(oauth.get_redis().ping(), STARTUP_REDIS_TIMEOUT)
+    except (RedisError, OSError, asyncio.TimeoutError):
+        logger.warning("Redis is unavailable at startup", exc_info=True)
 
-app = FastAPI(**OPENAPI_KWARGS)
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(
-    RateLimitExceeded,
-    lambda request, exc: JSONResponse(
-        status_code=429,
-        content={"detail": "Too Many Requests"}
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up connections, then run the user cache invalidation listener and
+    the avatar pipeline for the lifetime of the worker.
+    """
+    await warm_up()
+    listener = asyncio.create_task(oauth.get_user_cache().listen())
+    avatar_pipeline.start()
+    yield
+    await avatar_pipeline.stop()
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
+    shutdown_executor()
+    exporter = get_exporter()
+    if exporter is not None:
+        exporter.close()
+    await oauth.get_redis().aclose()
+    await dispose_engines()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the application.
+
+    :return: Configured FastAPI application.
+    :rtype: FastAPI
+    """
+    app = FastAPI(**OPENAPI_KWARGS, lifespan=lifespan)
+
+    app.add_exception_handler(
+        HashingQueueFull,
+        lambda request, exc: JSONResponse(
+            status_code=503,
+            content={"detail": "Service busy, try again"},
+            headers={"Retry-After": "1"}
+        )
     )
-)
-app.add_middleware(SlowAPIMiddleware)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost", "http://127.0.0.1"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(contacts.router)
-
-# Serve Sphinx HTML docs at /docs
-if os.path.isdir("docs/_build/html"):
-    app.mount(
-        "/docs",
-        StaticFiles(directory="docs/_build/html", html=True),
-        name="sphinx-docs"
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost", "http://127.0.0.1"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-DB-Query-Count", "X-DB-Time", "X-Trace-Id"],
     )
+    app.add_middleware(QueryStatsMiddleware)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    app.add_middleware(TracingMiddleware)
+
+    app.include_router(auth.router)
+    app.include_router(users.router)
+    app.include_router(contacts.router)
+    app.include_router(internal.router)
+    app.include_router(media.router)
+    if METRICS_ENABLED:
+        app.include_router(metrics.router)
+    instrument_routes(app)
+
+    # Serve Sphinx HTML docs at /docs
+    if os.path.isdir("docs/_build/html"):
+        app.mount(
+            "/docs",
+            StaticFiles(directory="docs/_build/html", html=True),
+            name="sphinx-docs"
+        )
+    return app
+
+
+app = create_app()
@@ -3,25 +3,47 @@ Contacts router for API.
 
 Provides endpoints for CRUD operations and search on contacts.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session
-from src.configuration.schemas import ContactOut, ContactCreate, ContactUpdate
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from src.configuration.schemas import ContactOut, ContactCreate, ContactUpdate, ContactImportResult, ContactBatchUpdate, ContactBatchResult, ContactPatch
 from src.database import contacts_repository
-from src.database.session import get_db
+from src.database.session import DBSession, run_db
 from src.security import oauth
+from src.services import contact_export, contact_import, response_cache
+from src.services.response_cache import get_contacts_db
 
 router = APIRouter(tags=["Contacts"])
 
+CONTACT_FIELDS = tuple(ContactOut.model_fields)
+
+BATCH_MAX_ITEMS = 1000
+
+
+def _dump_contacts(contacts) -> bytes:
+    """
+    Serialize contacts to a JSON array of ``ContactOut``.
+
+    Contacts come from our own database and were validated on the way in,
+    so they are not validated again (``EmailStr`` checks dominated the
+    cost): their fields are read in ``ContactOut`` order and encoded
+    straight to bytes by pydantic-core. The output is byte-for-byte what
+    ``TypeAdapter(list[ContactOut]).dump_json`` produces.
+    """
+    return to_json([{name: getattr(contact, name) for name in CONTACT_FIELDS} for contact in contacts])
+
 
 @router.post("/contacts/", response_model=ContactOut, status_code=201)
-def create_contact(contact: ContactCreate, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def create_contact(contact: ContactCreate, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Create a new contact for the current user.
 
     :param contact: Contact creation schema.
     :type contact: ContactCreate
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: Created contact.
     :rtype: ContactOut
@@ -29,20 +51,56 @@ def create_contact(contact: ContactCreate, db: Session = Depends(get_db), curren
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return contacts_repository.create_contact(db=db, contact=contact, user_id=current_user.id)
+    return await run_db(db, contacts_repository.create_contact, contact=contact, user_id=current_user.id)
+
+
+@router.post("/contacts/import", response_model=ContactImportResult)
+async def import_contacts(file: UploadFile = File(...), format: str | None = Query(None, pattern="^(csv|ndjson|vcard)$"), db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
+    """
+    Import contacts for the current user from a CSV, NDJSON or vCard file.
+
+    CSV files need a header row with the ``ContactCreate`` field names. Rows
+    that fail validation or reuse an existing email or phone are reported
+    individually; all other rows are imported.
+
+    :param file: Uploaded file.
+    :type file: UploadFile
+    :param format: File format; guessed from the file name or content type when omitted.
+    :type format: str, optional
+    :param db: SQLAlchemy session.
+    :type db: AsyncSession | Session
+    :param current_user: Current authenticated user.
+    :return: Import summary with per-row errors.
+    :rtype: ContactImportResult
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    fmt = format or contact_import.detect_format(
+        file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=400, detail="Cannot determine file format, pass ?format=csv|ndjson|vcard")
+    return await contact_import.import_contacts(db, file.file, fmt, current_user.id)
 
 
 @router.get("/contacts/", response_model=list[ContactOut])
-def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def read_contacts(skip: int = 0, limit: int = Query(100, ge=1, le=500), after: str | None = None, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Retrieve all contacts for the current user.
 
-    :param skip: Number of records to skip.
+    Pages are ordered by contact ID. Pass the ``X-Next-Cursor`` response header
+    back as ``after`` to fetch the next page; unlike ``skip`` this keeps the
+    cost of a page constant however deep the client goes.
+
+    :param skip: Number of records to skip (ignored when ``after`` is given).
     :type skip: int
     :param limit: Maximum number of records to return.
     :type limit: int
+    :param after: Opaque cursor returned by the previous page.
+    :type after: str, optional
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: List of contacts.
     :rtype: list[ContactOut]
@@ -50,18 +108,106 @@ def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return contacts_repository.get_contacts(db, user_id=current_user.id, skip=skip, limit=limit)
+    if after is None and skip:
+        params = {"skip": skip, "limit": limit}
+    else:
+        try:
+            after_id = contacts_repository.decode_cursor(
+                after) if after is not None else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        params = {"after": after_id, "limit": limit}
+
+    async def build():
+        if "skip" in params:
+            # Fetch one extra row to know whether another page exists
+            contacts = await run_db(
+                db, contacts_repository.get_contacts, user_id=current_user.id, skip=skip, limit=limit + 1)
+            next_cursor = None
+            if len(contacts) > limit:
+                contacts = contacts[:limit]
+                next_cursor = contacts_repository.encode_cursor(contacts[-1].id)
+        else:
+            contacts, next_cursor = await run_db(
+                db, contacts_repository.get_contacts_after, user_id=current_user.id, after_id=after_id, limit=limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return _dump_contacts(contacts), headers
+
+    return await response_cache.cached_json(current_user.id, "read_contacts", params, build)
+
+
+@router.get("/contacts/export")
+async def export_contacts(format: str = Query("csv", pattern="^(csv|ndjson)$"), current_user=Depends(oauth.get_current_user)):
+    """
+    Export all contacts of the current user as CSV or NDJSON.
+
+    The body is streamed from a server-side cursor, so memory use does not
+    depend on the number of contacts.
+
+    :param format: ``csv`` or ``ndjson``.
+    :type format: str
+    :param current_user: Current authenticated user.
+    :return: Streaming response with the exported contacts.
+    :rtype: StreamingResponse
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return StreamingResponse(
+        contact_export.stream_contacts(current_user.id, format),
+        media_type=contact_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'})
+
+
+@router.patch("/contacts/batch", response_model=list[ContactBatchResult])
+async def batch_update_contacts(changes: list[ContactBatchUpdate] = Body(..., max_length=BATCH_MAX_ITEMS), db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
+    """
+    Update many contacts of the current user in one transaction.
+
+    Each item carries a contact ID and only the fields to change.
+
+    :param changes: Contact IDs with the fields to change.
+    :type changes: list[ContactBatchUpdate]
+    :param db: SQLAlchemy session.
+    :type db: AsyncSession | Session
+    :param current_user: Current authenticated user.
+    :return: Per-item status: ``updated``, ``not_found`` or ``conflict``.
+    :rtype: list[ContactBatchResult]
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await run_db(db, contacts_repository.batch_update_contacts, changes=changes, user_id=current_user.id)
+
+
+@router.delete("/contacts/batch", response_model=list[ContactBatchResult])
+async def batch_delete_contacts(contact_ids: list[int] = Body(..., max_length=BATCH_MAX_ITEMS), db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
+    """
+    Delete many contacts of the current user in one statement.
+
+    :param contact_ids: IDs of the contacts.
+    :type contact_ids: list[int]
+    :param db: SQLAlchemy session.
+    :type db: AsyncSession | Session
+    :param current_user: Current authenticated user.
+    :return: Per-item status: ``deleted`` or ``not_found``.
+    :rtype: list[ContactBatchResult]
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await run_db(db, contacts_repository.batch_delete_contacts, contact_ids=contact_ids, user_id=current_user.id)
 
 
 @router.get("/contacts/{contact_id}", response_model=ContactOut)
-def read_contact(contact_id: int, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def read_contact(contact_id: int, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Retrieve a contact by ID for the current user.
 
     :param contact_id: ID of the contact.
     :type contact_id: int
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: Contact object.
     :rtype: ContactOut
@@ -69,15 +215,15 @@ def read_contact(contact_id: int, db: Session = Depends(get_db), current_user=De
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    db_contact = contacts_repository.get_contact(
-        db, contact_id=contact_id, user_id=current_user.id)
+    db_contact = await run_db(
+        db, contacts_repository.get_contact, contact_id=contact_id, user_id=current_user.id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
 
 
 @router.put("/contacts/{contact_id}", response_model=ContactOut)
-def update_contact(contact_id: int, contact: ContactUpdate, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def update_contact(contact_id: int, contact: ContactUpdate, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Update a contact for the current user.
 
@@ -86,7 +232,32 @@ def update_contact(contact_id: int, contact: ContactUpdate, db: Session = Depend
     :param contact: Contact update schema.
     :type contact: ContactUpdate
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
+    :param current_user: Current authenticated user.
+    :return: Updated contact.
+    :rtype: ContactOut
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    db_contact = await run_db(
+        db, contacts_repository.update_contact, contact_id=contact_id, contact=contact, user_id=current_user.id)
+    if db_contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return db_contact
+
+
+@router.patch("/contacts/{contact_id}", response_model=ContactOut)
+async def patch_contact(contact_id: int, contact: ContactPatch, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
+    """
+    Update only the given fields of a contact of the current user.
+
+    :param contact_id: ID of the contact.
+    :type contact_id: int
+    :param contact: Fields to change.
+    :type contact: ContactPatch
+    :param db: SQLAlchemy session.
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: Updated contact.
     :rtype: ContactOut
@@ -94,22 +265,22 @@ def update_contact(contact_id: int, contact: ContactUpdate, db: Session = Depend
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    db_contact = contacts_repository.update_contact(
-        db, contact_id=contact_id, contact=contact, user_id=current_user.id)
+    db_contact = await run_db(
+        db, contacts_repository.update_contact, contact_id=contact_id, contact=contact, user_id=current_user.id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
 
 
 @router.delete("/contacts/{contact_id}", response_model=ContactOut)
-def delete_contact(contact_id: int, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def delete_contact(contact_id: int, db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Delete a contact for the current user.
 
     :param contact_id: ID of the contact.
     :type contact_id: int
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: Deleted contact.
     :rtype: ContactOut
@@ -117,15 +288,15 @@ def delete_contact(contact_id: int, db: Session = Depends(get_db), current_user=
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    db_contact = contacts_repository.delete_contact(
-        db, contact_id=contact_id, user_id=current_user.id)
+    db_contact = await run_db(
+        db, contacts_repository.delete_contact, contact_id=contact_id, user_id=current_user.id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
 
 
 @router.get("/contacts/search/", response_model=list[ContactOut])
-def search_contacts(first_name: str | None = None, last_name: str | None = None, email: str | None = None, db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def search_contacts(first_name: str | None = None, last_name: str | None = None, email: str | None = None, q: str | None = None, limit: int = Query(100, ge=1, le=500), db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Search contacts for the current user by first name, last name, or email.
 
@@ -135,8 +306,12 @@ def search_contacts(first_name: str | None = None, last_name: str | None = None,
     :type last_name: str, optional
     :param email: Email to search.
     :type email: str, optional
+    :param q: Free-text term; results are ordered by relevance.
+    :type q: str, optional
+    :param limit: Maximum number of records to return.
+    :type limit: int
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: List of matching contacts.
     :rtype: list[ContactOut]
@@ -144,16 +319,27 @@ def search_contacts(first_name: str | None = None, last_name: str | None = None,
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return contacts_repository.search_contacts(db, user_id=current_user.id, first_name=first_name, last_name=last_name, email=email)
+    params = {"first_name": first_name, "last_name": last_name,
+              "email": email, "q": q, "limit": limit}
+
+    async def build():
+        contacts = await run_db(db, contacts_repository.search_contacts, user_id=current_user.id, **params)
+        return _dump_contacts(contacts), {}
+
+    return await response_cache.cached_json(current_user.id, "search_contacts", params, build)
 
 
 @router.get("/contacts/upcoming_birthdays/", response_model=list[ContactOut])
-def upcoming_birthdays(db: Session = Depends(get_db), current_user=Depends(oauth.get_current_user)):
+async def upcoming_birthdays(days: int = Query(7, ge=0, le=366), db: DBSession = Depends(get_contacts_db), current_user=Depends(oauth.get_current_user)):
     """
     Get contacts with upcoming birthdays for the current user.
 
+    The window starts today in the user's timezone (UTC when none is set).
+
+    :param days: Number of days to look ahead.
+    :type days: int
     :param db: SQLAlchemy session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param current_user: Current authenticated user.
     :return: List of contacts with upcoming birthdays.
     :rtype: list[ContactOut]
@@ -161,4 +347,14 @@ def upcoming_birthdays(db: Session = Depends(get_db), current_user=Depends(oauth
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return contacts_repository.get_upcoming_birthdays(db, user_id=current_user.id)
+    try:
+        tz = ZoneInfo(current_user.timezone or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = ZoneInfo("UTC")
+    today = datetime.now(tz).date()
+
+    async def build():
+        contacts = await run_db(db, contacts_repository.get_upcoming_birthdays, user_id=current_user.id, days=days, today=today)
+        return _dump_contacts(contacts), {}
+
+    return await response_cache.cached_json(current_user.id, "upcoming_birthdays", {"days": days, "today": today}, build)
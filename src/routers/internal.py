@@ -0,0 +1,71 @@
+"""
+Internal router for API.
+
+Provides operational endpoints used to size and tune the service. They are
+hidden from the OpenAPI schema and restricted to admins.
+"""
+from fastapi import APIRouter, Depends
+from src.database.pool import POOL_STATS
+from src.security import oauth
+from src.security.oauth import get_user_cache
+from src.security.passwords import HASH_STATS
+from src.security.rate_limit import get_limiter
+from src.services import response_cache
+
+router = APIRouter(prefix="/internal", include_in_schema=False,
+                   dependencies=[Depends(oauth.get_current_active_admin)])
+
+
+@router.get("/pool")
+async def pool_stats():
+    """
+    Report connection pool statistics of this worker.
+
+    :return: Statistics of the sync and async engine pools.
+    :rtype: dict
+    """
+    return {name: stats.snapshot() for name, stats in POOL_STATS.items()}
+
+
+@router.get("/password-hashing")
+async def password_hashing_stats():
+    """
+    Report password hashing executor statistics of this worker.
+
+    :return: Queue depth, durations, rejections and rehash count.
+    :rtype: dict
+    """
+    return HASH_STATS.snapshot()
+
+
+@router.get("/user-cache")
+async def user_cache_stats():
+    """
+    Report user cache hit/miss counters of this worker.
+
+    :return: L1/L2 hits, misses, invalidations and L1 size.
+    :rtype: dict
+    """
+    return get_user_cache().snapshot()
+
+
+@router.get("/response-cache")
+async def response_cache_stats():
+    """
+    Report contact response cache hit/miss counters of this worker.
+
+    :return: Hits, misses and Redis errors per endpoint.
+    :rtype: dict
+    """
+    return response_cache.snapshot()
+
+
+@router.get("/rate-limits")
+async def rate_limit_stats():
+    """
+    Report rate limiter counters of this worker.
+
+    :return: Allowed/rejected requests per policy and local fallback decisions.
+    :rtype: dict
+    """
+    return get_limiter().snapshot()
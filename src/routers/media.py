@@ -0,0 +1,45 @@
+"""
+Media router for API.
+
+Serves files of the ``local`` storage backend. Names are content hashes, so
+a response never changes: it carries a strong ``ETag``, may be cached
+forever, and supports ``Range`` and ``If-Range`` requests.
+"""
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from src.services import storage
+
+router = APIRouter(tags=["Media"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get(storage.STORAGE_PUBLIC_URL + "/{name}", response_class=FileResponse)
+async def get_media(name: str, request: Request):
+    """
+    Download a stored file.
+
+    :param name: File name, ``<sha256>.<extension>``.
+    :type name: str
+    :param request: Incoming request, for ``If-None-Match``.
+    :type request: Request
+    :return: The file, a part of it, or 304 if the client's copy is current.
+    :rtype: FileResponse
+    """
+    backend = storage.get_storage()
+    match = storage.LOCAL_NAME.match(name)
+    if not isinstance(backend, storage.LocalStorage) or match is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    path = backend.path(name)
+    try:
+        stat_result = await run_in_threadpool(path.stat)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    etag = f'"{match.group(1)}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=storage.MEDIA_TYPES[match.group(2)],
+                        headers=headers, stat_result=stat_result)
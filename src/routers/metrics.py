@@ -0,0 +1,20 @@
+"""
+Metrics router for API.
+
+Exposes the Prometheus metrics of this worker for scraping.
+"""
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Render all registered metrics in the Prometheus text format.
+
+    :return: Metrics of this worker.
+    :rtype: Response
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -3,53 +3,50 @@ User router for API.
 
 Provides endpoints for user registration, profile, avatar upload, and email verification.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Response, File, UploadFile, Request, Body
-from sqlalchemy.orm import Session
-from src.configuration.schemas import UserCreate, UserRead, PasswordResetConfirm, PasswordResetRequest
+from fastapi import APIRouter, Depends, HTTPException, status, Response, File, UploadFile, Body
+from fastapi.concurrency import run_in_threadpool
+from src.configuration.schemas import AvatarJob, UserCreate, UserRead, PasswordResetConfirm, PasswordResetRequest
 from src.services import user_service
-from src.database.session import get_db
+from src.database.session import DBSession, get_db
 from src.security import oauth
-from src.security.oauth import SECRET_KEY, create_access_token
-from src.services.user_service import verify_email_token, update_avatar
-from src.security.passwords import get_password_hash
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from authlib.jose import jwt, JoseError
+from src.security.oauth import SECRET_KEY, create_access_token, decode_token
+from src.services import avatar_images, avatar_pipeline
+from src.services.user_service import verify_email_token
+from src.security.rate_limit import rate_limit
+from authlib.jose import JoseError
 from src.database.models import UserRole
 
 
 router = APIRouter(tags=["User"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.post("/users", response_model=UserRead, status_code=201)
-def create_user(user_create: UserCreate, session: Session = Depends(get_db)):
+async def create_user(user_create: UserCreate, session: DBSession = Depends(get_db)):
     """
     Create a new user.
 
     :param user_create: User creation schema.
     :type user_create: UserCreate
     :param session: SQLAlchemy session.
-    :type session: Session
+    :type session: AsyncSession | Session
     :return: Created user.
     :rtype: UserRead
     """
     if user_create.role not in (UserRole.USER, UserRole.ADMIN):
         raise HTTPException(
             status_code=400, detail=f"Invalid role: {user_create.role}")
-    user = user_service.create_user(
-        session, user_create.username, user_create.password, role=user_create.role)
+    user = await user_service.create_user(
+        session, user_create.username, user_create.password, role=user_create.role, timezone=user_create.timezone)
     return user
 
 
-@router.get("/me")
-@limiter.limit("5/minute")
-def get_me(request: Request, current_user=Depends(oauth.get_current_user)):
+@router.get("/me", dependencies=[Depends(rate_limit("me"))])
+async def get_me(current_user=Depends(oauth.get_current_user)):
     """
     Get current authenticated user profile.
 
-    :param request: FastAPI request object.
-    :type request: Request
+    Rate limited by the ``me`` policy.
+
     :param current_user: Current authenticated user.
     :return: Current user object.
     :rtype: UserRead
@@ -57,37 +54,86 @@ def get_me(request: Request, current_user=Depends(oauth.get_current_user)):
     return current_user
 
 
-@router.post("/users/avatar")
-def upload_avatar(current_user=Depends(oauth.get_current_user), db: Session = Depends(get_db), file: UploadFile = File(...)):
+@router.post("/users/avatar", response_model=AvatarJob, status_code=202)
+async def upload_avatar(response: Response, current_user=Depends(oauth.get_current_user), file: UploadFile = File(...)):
     """
     Upload avatar for the current user. Only admins can change their own avatar if they are the default admin.
+
+    The image is processed in the background; poll the URL in the
+    ``Location`` header until the job is ``done``.
+
+    :param response: FastAPI response used to set the ``Location`` header.
+    :type response: Response
+    :param current_user: Current authenticated user.
+    :param file: Image file.
+    :type file: UploadFile
+    :return: Queued job.
+    :rtype: AvatarJob
     """
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=403, detail="Only admin can change their own avatar.")
-    url = update_avatar(db, current_user, file)
-    return {"avatar_url": url}
+    # The upload is already spooled to disk: check its size and header there,
+    # then hand the worker a copy on disk instead of the bytes.
+    if file.size is not None and file.size > avatar_pipeline.AVATAR_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        await run_in_threadpool(avatar_images.probe, file.file)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    try:
+        path = await run_in_threadpool(avatar_pipeline.spool_upload, file.file)
+    except avatar_pipeline.AvatarTooLarge:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        job_id = await avatar_pipeline.submit(current_user.id, current_user.username, path)
+    except avatar_pipeline.AvatarQueueFull:
+        avatar_pipeline.discard(path)
+        raise HTTPException(status_code=503, detail="Service busy, try again",
+                            headers={"Retry-After": "1"})
+    except BaseException:
+        avatar_pipeline.discard(path)
+        raise
+    response.headers["Location"] = f"/users/avatar/jobs/{job_id}"
+    return AvatarJob(job_id=job_id, status="queued")
+
+
+@router.get("/users/avatar/jobs/{job_id}", response_model=AvatarJob)
+async def avatar_job_status(job_id: str, current_user=Depends(oauth.get_current_user)):
+    """
+    Get the status of an avatar upload of the current user.
+
+    :param job_id: Job ID returned by the upload.
+    :type job_id: str
+    :param current_user: Current authenticated user.
+    :return: Job status, with the avatar URLs once done.
+    :rtype: AvatarJob
+    """
+    job = await avatar_pipeline.get_job(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return AvatarJob(job_id=job_id, **{k: v for k, v in job.items() if k != "user_id"})
 
 
 @router.get("/verify-email/{token}")
-def verify_email(token: str, session: Session = Depends(get_db)):
+async def verify_email(token: str, session: DBSession = Depends(get_db)):
     """
     Verify user email using token.
 
     :param token: Email verification token.
     :type token: str
     :param session: SQLAlchemy session.
-    :type session: Session
+    :type session: AsyncSession | Session
     :return: Verification message.
     :rtype: dict
     """
-    message = verify_email_token(token, session, SECRET_KEY)
+    message = await verify_email_token(token, session, SECRET_KEY)
     return {"message": message}
 
 
 @router.post("/users/request-password-reset")
-def request_password_reset(data: PasswordResetRequest = Body(...), session: Session = Depends(get_db)):
-    user = user_service.get_user_by_username(session, data.email)
+async def request_password_reset(data: PasswordResetRequest = Body(...), session: DBSession = Depends(get_db)):
+    user = await user_service.get_user_by_username(session, data.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     token = create_access_token(
@@ -97,18 +143,13 @@ def request_password_reset(data: PasswordResetRequest = Body(...), session: Sess
 
 
 @router.post("/users/reset-password")
-def reset_password(data: PasswordResetConfirm = Body(...), session: Session = Depends(get_db)):
+async def reset_password(data: PasswordResetConfirm = Body(...), session: DBSession = Depends(get_db)):
     try:
-        claims = jwt.decode(data.token, SECRET_KEY)
-        claims.validate()
+        claims = decode_token(data.token)
         username = claims.get('sub')
         if claims.get('action') != 'reset_password':
             raise HTTPException(status_code=400, detail="Invalid token action")
     except JoseError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-    user = user_service.get_user_by_username(session, username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user.password = get_password_hash(data.new_password)
-    session.commit()
+    await user_service.reset_password(session, username, data.new_password)
     return {"message": "Password reset successful"}
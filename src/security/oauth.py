@@ -7,30 +7,59 @@ Provides functions for token creation, user authentication, and role validation.
 :module: src.security.oauth
 """
 from datetime import datetime, timezone, timedelta
-import json
+import functools
+import hashlib
+import time
 
-from sqlalchemy.orm import Session
 from authlib.jose import jwt, JoseError
 from fastapi import HTTPException
 from fastapi import status
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
-import redis
+import redis.asyncio as redis
 
 import os
 from src.database.models import User, UserRole
-from src.database.session import get_db
+from src.database.session import DBSession, get_db, run_db
 from src.database import user_repository
+from src.security.user_cache import UserCache
+from src.services.ttl_cache import TTLCache
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'changeme')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 ACCESS_TOKEN_EXPIRES_IN_MINUTES = int(
     os.getenv('ACCESS_TOKEN_EXPIRES_IN_MINUTES', '30'))
 
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Validated claims keyed by token digest, each kept until the token's exp
+claims_cache = TTLCache(TOKEN_CACHE_SIZE, ttl=0)
+
 redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-redis_client = redis.from_url(redis_url, decode_responses=True)
+
+
+@functools.cache
+def get_redis():
+    """
+    Create the shared Redis client on first use.
+
+    The client connects lazily, on its first command.
+
+    :return: ``redis.asyncio`` client with ``decode_responses=True``.
+    """
+    return redis.from_url(redis_url, decode_responses=True)
+
+
+@functools.cache
+def get_user_cache() -> UserCache:
+    """
+    Return the worker's user cache.
+
+    :rtype: UserCache
+    """
+    return UserCache(get_redis())
 
 
 def create_access_token(data: dict) -> str:
@@ -50,14 +79,45 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(header, payload, SECRET_KEY).decode('utf-8')
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def decode_token(token: str, key: str = SECRET_KEY) -> dict:
+    """
+    Decode and validate a JWT, reusing the result for repeated tokens.
+
+    Validated claims are cached under a digest of the key and token until
+    the token's ``exp``, so a token presented again skips signature
+    verification and JSON parsing. Invalid tokens are never cached.
+
+    :param token: Encoded JWT.
+    :type token: str
+    :param key: Secret used to verify the signature.
+    :type key: str
+    :return: Validated claims; treat as read-only, the dict is shared.
+    :rtype: dict
+    :raises JoseError: If the token is malformed, forged or expired.
+    """
+    digest = hashlib.sha256(f"{key}\0{token}".encode()).digest()
+    claims = claims_cache.get(digest)
+    if claims is not None:
+        return claims
+    decoded = jwt.decode(token, key)
+    decoded.validate()
+    claims = dict(decoded)
+    exp = claims.get('exp')
+    if isinstance(exp, (int, float)):
+        claims_cache.set(digest, claims, ttl=exp - time.time())
+    return claims
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DBSession = Depends(get_db)) -> User:
     """
     Retrieve the current user from the JWT token.
 
+    Users are served from the two-tier :class:`UserCache` when possible.
+
     :param token: JWT access token from OAuth2 scheme.
     :type token: str
     :param db: SQLAlchemy database session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :return: User object if credentials are valid.
     :rtype: User
     :raises HTTPException: If credentials are invalid or user not found.
@@ -65,35 +125,33 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     jwt_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     try:
-        claims = jwt.decode(token, SECRET_KEY)
-        claims.validate()
+        claims = decode_token(token)
         username = claims.get('sub')
         if not username:
             raise jwt_exception
-        cached = redis_client.get(f"user:{username}")
-        if cached:
-            data = json.loads(cached)
-            print("TOOK USER FROM CACHE")
-            user = User(id=data["id"], username=data["username"], role=data["role"],
-                        is_verified=data["is_verified"], avatar_url=data["avatar_url"], password="")
-            return user
-        user = user_repository.get_user_by_username(db, username)
+        data = await get_user_cache().get(username)
+        if data:
+            return User(id=data["id"], username=data["username"], role=data["role"],
+                        is_verified=data["is_verified"], avatar_url=data["avatar_url"],
+                        timezone=data.get("timezone"), password="")
+        user = await run_db(db, user_repository.get_user_by_username, username)
         if not user:
             raise jwt_exception
         # Cache user for future requests
-        redis_client.set(f"user:{username}", json.dumps({
+        await get_user_cache().set(username, {
             "id": user.id,
             "username": user.username,
             "role": user.role,
             "is_verified": user.is_verified,
-            "avatar_url": user.avatar_url
-        }), ex=3600)
+            "avatar_url": user.avatar_url,
+            "timezone": user.timezone
+        })
         return user
     except JoseError as exc:
         raise jwt_exception from exc
 
 
-def get_current_active_user(user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(user: User = Depends(get_current_user)) -> User:
     """
     Ensure the current user is active.
 
@@ -105,7 +163,7 @@ def get_current_active_user(user: User = Depends(get_current_user)) -> User:
     return user
 
 
-def get_current_active_admin(user: User = Depends(get_current_active_user)):
+async def get_current_active_admin(user: User = Depends(get_current_active_user)):
     """
     Ensure the current user has admin privileges.
 
@@ -2,20 +2,160 @@
 Password hashing and verification utilities.
 
 Provides functions to hash and verify passwords using bcrypt.
+
+Request handlers use the ``*_async`` variants, which run bcrypt on a
+dedicated, bounded executor so hashing never blocks the event loop or the
+shared threadpool:
+
+- ``BCRYPT_ROUNDS`` -- work factor for new hashes (default 12)
+- ``PASSWORD_HASH_EXECUTOR`` -- ``thread`` or ``process`` (default ``thread``)
+- ``PASSWORD_HASH_WORKERS`` -- executor size (default: CPU count, at most 4)
+- ``PASSWORD_HASH_MAX_PENDING`` -- queued + running jobs before new ones are rejected (default 64)
 """
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
 import bcrypt
 
+from src.services import tracing
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    "PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class HashingQueueFull(RuntimeError):
+    """
+    Raised when too many hashing jobs are already queued.
+    """
+
+
+class HashStats:
+    """
+    Thread-safe counters for the password hashing executor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashes = 0
+        self.duration_total = 0.0
+        self.duration_max = 0.0
+
+    def try_acquire(self, limit: int) -> bool:
+        """
+        Reserve a slot in the queue.
+
+        :param limit: Maximum number of pending jobs.
+        :type limit: int
+        :return: False if the queue is full.
+        :rtype: bool
+        """
+        with self._lock:
+            if self.pending >= limit:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            return True
+
+    def release(self, seconds: float) -> None:
+        """
+        Free a queue slot and record the job's queue + run time.
+
+        :param seconds: Time from submission to completion.
+        :type seconds: float
+        """
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.duration_total += seconds
+            self.duration_max = max(self.duration_max, seconds)
+
+    def record_rehash(self) -> None:
+        """
+        Count a stored hash upgraded to the current work factor.
+        """
+        with self._lock:
+            self.rehashes += 1
+
+    def snapshot(self) -> dict:
+        """
+        Return the current counters.
+
+        :return: Hashing statistics.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "executor": PASSWORD_HASH_EXECUTOR,
+                "workers": PASSWORD_HASH_WORKERS,
+                "rounds": BCRYPT_ROUNDS,
+                "queue_depth": self.pending,
+                "peak_queue_depth": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashes": self.rehashes,
+                "duration_avg_ms": self.duration_total / self.completed * 1000 if self.completed else 0.0,
+                "duration_max_ms": self.duration_max * 1000,
+            }
+
+
+HASH_STATS = HashStats()
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> Executor:
+    """
+    Create the hashing executor on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Stop the hashing executor, waiting for running jobs.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
     """
     Hash a password using bcrypt.
 
     :param password: Plain text password.
     :type password: str
+    :param rounds: bcrypt work factor.
+    :type rounds: int
     :return: Hashed password.
     :rtype: str
     """
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = bcrypt.hashpw(
+        password.encode('utf-8'), bcrypt.gensalt(rounds))
     return hashed_password.decode('utf-8')
 
 
@@ -31,3 +171,62 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     :rtype: bool
     """
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a stored hash uses a different work factor than ``BCRYPT_ROUNDS``.
+
+    :param hashed_password: Hashed password, e.g. ``$2b$12$...``.
+    :type hashed_password: str
+    :return: True if the hash should be regenerated.
+    :rtype: bool
+    """
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return True
+    return int(parts[2]) != BCRYPT_ROUNDS
+
+
+async def _run_hashing(fn, *args):
+    """
+    Run a hashing function on the dedicated executor.
+
+    :raises HashingQueueFull: If ``PASSWORD_HASH_MAX_PENDING`` jobs are already pending.
+    """
+    if not HASH_STATS.try_acquire(PASSWORD_HASH_MAX_PENDING):
+        raise HashingQueueFull("Password hashing queue is full")
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"bcrypt.{fn.__name__}", **{"bcrypt.executor": PASSWORD_HASH_EXECUTOR}):
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        HASH_STATS.release(time.perf_counter() - start)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password on the hashing executor.
+
+    :param password: Plain text password.
+    :type password: str
+    :return: Hashed password.
+    :rtype: str
+    :raises HashingQueueFull: If the hashing queue is full.
+    """
+    return await _run_hashing(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password on the hashing executor.
+
+    :param plain_password: Plain text password.
+    :type plain_password: str
+    :param hashed_password: Hashed password.
+    :type hashed_password: str
+    :return: True if password matches, False otherwise.
+    :rtype: bool
+    :raises HashingQueueFull: If the hashing queue is full.
+    """
+    return await _run_hashing(verify_password, plain_password, hashed_password)
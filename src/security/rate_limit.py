@@ -0,0 +1,207 @@
+"""
+Cluster-wide rate limiting with Redis token buckets.
+
+Each request takes one token from every bucket of its route's policies
+(see ``src.configuration.rate_limits``). Buckets live in Redis, so all
+workers share them; a Lua script refills and takes tokens atomically in a
+single round trip. If Redis is slow or down, the limiter switches to
+in-process buckets for ``RATE_LIMIT_REDIS_RETRY`` seconds instead of
+waiting on it for every request.
+
+- ``RATE_LIMIT_REDIS_TIMEOUT`` -- seconds to wait for Redis before using local buckets (default 0.05)
+- ``RATE_LIMIT_REDIS_RETRY`` -- seconds to stay on local buckets after a Redis failure (default 5)
+
+:module: src.security.rate_limit
+"""
+import asyncio
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from authlib.jose import JoseError
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.configuration.rate_limits import POLICIES, RATE_LIMIT_ENABLED, RateLimitPolicy
+from src.security.oauth import decode_token, get_redis
+from src.services.ttl_cache import TTLCache
+
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.05"))
+RATE_LIMIT_REDIS_RETRY = float(os.getenv("RATE_LIMIT_REDIS_RETRY", "5"))
+
+logger = logging.getLogger(__name__)
+
+# KEYS: bucket keys; ARGV: rate and capacity of each bucket, in KEYS order.
+# Returns "0" if a token was taken from every bucket, otherwise the seconds
+# until the emptiest bucket has one; buckets are only charged if all allow.
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(tonumber(ARGV[2 * i]) / tonumber(ARGV[2 * i - 1]) * 1000))
+end
+return '0'
+"""
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter backed by Redis with an in-process fallback.
+
+    :param redis_client: ``redis.asyncio`` client.
+    :param timeout: Seconds to wait for Redis.
+    :type timeout: float
+    :param retry_after: Seconds to use local buckets after a Redis failure.
+    :type retry_after: float
+    :param local_size: Maximum number of local buckets.
+    :type local_size: int
+    """
+
+    def __init__(self, redis_client, timeout: float = RATE_LIMIT_REDIS_TIMEOUT,
+                 retry_after: float = RATE_LIMIT_REDIS_RETRY, local_size: int = 10000,
+                 clock=time.monotonic):
+        self.script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.local = TTLCache(local_size, ttl=0, clock=clock)
+        self._clock = clock
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"allowed": 0, "rejected": 0})
+        self.fallbacks = 0
+
+    def _count(self, name: str, allowed: bool) -> None:
+        with self._lock:
+            self.stats[name]["allowed" if allowed else "rejected"] += 1
+
+    def _take_local(self, buckets: list[tuple[str, RateLimitPolicy]]) -> float:
+        """
+        Run the token bucket algorithm on in-process buckets.
+        """
+        now = self._clock()
+        levels = []
+        wait = 0.0
+        for key, policy in buckets:
+            tokens, ts = self.local.get(key, (policy.limit, now))
+            tokens = min(policy.limit, tokens + max(0.0, now - ts) * policy.rate)
+            levels.append(tokens)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / policy.rate)
+        if wait:
+            return wait
+        for (key, policy), tokens in zip(buckets, levels):
+            self.local.set(key, (tokens - 1, now), ttl=policy.period)
+        return 0.0
+
+    async def take(self, name: str, buckets: list[tuple[str, RateLimitPolicy]]) -> float:
+        """
+        Take one token from each bucket.
+
+        :param name: Policy name, used for the counters.
+        :type name: str
+        :param buckets: Bucket keys with their policies.
+        :type buckets: list[tuple[str, RateLimitPolicy]]
+        :return: 0 if the request is allowed, otherwise seconds until it would be.
+        :rtype: float
+        """
+        wait = None
+        if self._clock() >= self._redis_down_until:
+            args = []
+            for _, policy in buckets:
+                args += [policy.rate, policy.limit]
+            try:
+                wait = float(await asyncio.wait_for(
+                    self.script(keys=[key for key, _ in buckets], args=args), self.timeout))
+            except (RedisError, OSError, asyncio.TimeoutError):
+                logger.warning("Rate limit backend unavailable, using local buckets", exc_info=True)
+                self._redis_down_until = self._clock() + self.retry_after
+        if wait is None:
+            with self._lock:
+                self.fallbacks += 1
+            wait = self._take_local(buckets)
+        self._count(name, not wait)
+        return wait
+
+    def snapshot(self) -> dict:
+        """
+        Return allowed/rejected counters per policy and the number of local decisions.
+
+        :return: Limiter statistics.
+        :rtype: dict
+        """
+        with self._lock:
+            return {"policies": {name: dict(counters) for name, counters in self.stats.items()},
+                    "local_fallbacks": self.fallbacks}
+
+
+@functools.cache
+def get_limiter() -> RateLimiter:
+    """
+    Return the worker's rate limiter.
+
+    :rtype: RateLimiter
+    """
+    return RateLimiter(get_redis())
+
+
+def _identity(request: Request, per: str) -> str:
+    """
+    Return the bucket identity of a request: the token subject or the client IP.
+    """
+    if per == "user":
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                subject = decode_token(token).get("sub")
+            except (JoseError, ValueError):
+                subject = None
+            if subject:
+                return f"user:{subject}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(name: str):
+    """
+    Build a route dependency enforcing the policies registered under ``name``.
+
+    :param name: Key of ``src.configuration.rate_limits.POLICIES``.
+    :type name: str
+    :return: FastAPI dependency raising 429 with ``Retry-After`` when a limit is hit.
+    """
+    policies = POLICIES[name]
+
+    async def check(request: Request) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+        buckets = [(f"rl:{name}:{index}:{_identity(request, policy.per)}", policy)
+                   for index, policy in enumerate(policies)]
+        wait = await get_limiter().take(name, buckets)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too Many Requests",
+                headers={"Retry-After": str(math.ceil(wait))})
+
+    return check
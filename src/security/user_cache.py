@@ -0,0 +1,144 @@
+"""
+Two-tier cache of authenticated users.
+
+L1 is a bounded in-process LRU/TTL cache, so repeated requests of the same
+user cost no network hop. L2 is Redis, shared by all workers. User-mutating
+paths call :meth:`UserCache.invalidate`, which clears both tiers and
+broadcasts the username over Redis pub/sub so every worker drops its L1
+copy.
+
+- ``USER_CACHE_TTL`` -- Redis entry lifetime in seconds (default 3600)
+- ``USER_CACHE_L1_TTL`` -- in-process entry lifetime in seconds (default 60)
+- ``USER_CACHE_L1_SIZE`` -- in-process entries per worker (default 10000)
+
+:module: src.security.user_cache
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from src.services import tracing
+from src.services.ttl_cache import TTLCache
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_L1_TTL = float(os.getenv("USER_CACHE_L1_TTL", "60"))
+USER_CACHE_L1_SIZE = int(os.getenv("USER_CACHE_L1_SIZE", "10000"))
+
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    In-process L1 in front of a Redis L2, with pub/sub invalidation.
+
+    :param redis_client: ``redis.asyncio`` client with ``decode_responses=True``.
+    """
+
+    def __init__(self, redis_client, ttl: int = USER_CACHE_TTL,
+                 l1_ttl: float = USER_CACHE_L1_TTL, l1_size: int = USER_CACHE_L1_SIZE):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local = TTLCache(l1_size, l1_ttl)
+        self._lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0,
+                      "misses": 0, "invalidations": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def key(username: str) -> str:
+        """
+        Redis key of a cached user.
+        """
+        return f"user:{username}"
+
+    async def get(self, username: str) -> dict | None:
+        """
+        Look a user up in L1, then in Redis.
+
+        :param username: Username of the user.
+        :type username: str
+        :return: Cached user fields or None on a miss.
+        :rtype: dict or None
+        """
+        data = self.local.get(username)
+        if data is not None:
+            self._count("l1_hits")
+            return data
+        with tracing.span("redis.get", **{"db.system": "redis"}):
+            cached = await self.redis.get(self.key(username))
+        if not cached:
+            self._count("misses")
+            return None
+        data = json.loads(cached)
+        self.local.set(username, data)
+        self._count("l2_hits")
+        return data
+
+    async def set(self, username: str, data: dict) -> None:
+        """
+        Store a user in both tiers.
+
+        :param username: Username of the user.
+        :type username: str
+        :param data: JSON-serialisable user fields.
+        :type data: dict
+        """
+        self.local.set(username, data)
+        with tracing.span("redis.set", **{"db.system": "redis"}):
+            await self.redis.set(self.key(username), json.dumps(data), ex=self.ttl)
+
+    async def invalidate(self, username: str) -> None:
+        """
+        Drop a user from both tiers and tell the other workers to do the same.
+
+        :param username: Username of the changed user.
+        :type username: str
+        """
+        self.local.pop(username)
+        self._count("invalidations")
+        await self.redis.delete(self.key(username))
+        await self.redis.publish(INVALIDATION_CHANNEL, username)
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """
+        Apply invalidations broadcast by other workers until cancelled.
+
+        L1 is cleared whenever the subscription is (re)established, since
+        messages sent while disconnected are lost.
+
+        :param retry_delay: Seconds to wait before resubscribing after an error.
+        :type retry_delay: float
+        """
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.local.pop(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(
+                    "User cache invalidation listener failed, retrying", exc_info=True)
+                await asyncio.sleep(retry_delay)
+            finally:
+                await pubsub.aclose()
+
+    def snapshot(self) -> dict:
+        """
+        Return hit/miss counters and the L1 size.
+
+        :return: Cache statistics.
+        :rtype: dict
+        """
+        with self._lock:
+            return {**self.stats, "l1_size": len(self.local)}
@@ -0,0 +1,88 @@
+"""
+Avatar image processing.
+
+Runs in the avatar worker processes, so it only depends on Pillow.
+
+- ``AVATAR_SIZES`` -- comma-separated edge lengths of the square variants (default ``512,256,64``)
+- ``AVATAR_MAX_PIXELS`` -- largest accepted source image, in pixels (default 40000000)
+
+:module: src.services.avatar_images
+"""
+import io
+import os
+from typing import BinaryIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+AVATAR_SIZES = tuple(sorted(
+    (int(size) for size in os.getenv("AVATAR_SIZES", "512,256,64").split(",")), reverse=True))
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", "40000000"))
+AVATAR_CONTENT_TYPE = "image/jpeg"
+
+Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+
+
+def probe(data: bytes | BinaryIO) -> str:
+    """
+    Check that the data is a supported image without decoding its pixels.
+
+    File objects are rewound afterwards; only the image header is read.
+
+    :param data: Uploaded file content or a seekable binary file object.
+    :type data: bytes | BinaryIO
+    :return: Image format, e.g. ``PNG``.
+    :rtype: str
+    :raises ValueError: If the data is not an image or is too large.
+    """
+    stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    try:
+        with Image.open(stream) as image:
+            width, height = image.size
+            image_format = image.format
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise ValueError("Unsupported image") from exc
+    finally:
+        stream.seek(0)
+    if width * height > AVATAR_MAX_PIXELS:
+        raise ValueError("Image is too large")
+    return image_format
+
+
+def render_variants(source: bytes | str, sizes: tuple[int, ...] = AVATAR_SIZES, quality: int = 85) -> dict[int, bytes]:
+    """
+    Produce square JPEG variants of an image.
+
+    The EXIF orientation is applied, then all metadata (EXIF, ICC, comments)
+    is dropped. JPEG sources are decoded at a reduced scale when that still
+    covers the largest variant, and each variant is cropped and scaled from
+    the next larger one.
+
+    :param source: Source image, or the path of a file holding it.
+    :type source: bytes | str
+    :param sizes: Edge lengths of the variants.
+    :type sizes: tuple[int, ...]
+    :param quality: JPEG quality.
+    :type quality: int
+    :return: Encoded variants by edge length.
+    :rtype: dict[int, bytes]
+    """
+    variants = {}
+    with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as image:
+        largest = max(sizes)
+        image.draft("RGB", (largest, largest))
+        source = ImageOps.exif_transpose(image)
+        if source.mode in ("RGBA", "LA", "P"):
+            source = source.convert("RGBA")
+            background = Image.new("RGB", source.size, "white")
+            background.paste(source, mask=source.getchannel("A"))
+            source = background
+        else:
+            source = source.convert("RGB")
+        # The encoder writes comments and profiles it finds in ``info``
+        source.info.clear()
+        for size in sorted(sizes, reverse=True):
+            source = ImageOps.fit(source, (size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            source.save(buffer, "JPEG", quality=quality, optimize=True)
+            variants[size] = buffer.getvalue()
+    return variants
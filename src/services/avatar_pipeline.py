@@ -0,0 +1,236 @@
+"""
+Background avatar processing.
+
+Uploads are copied to a temporary file, queued in process and handled by
+``AVATAR_WORKERS`` consumer tasks; only the file path crosses into the
+executor. Each job renders the variants of ``src.services.avatar_images`` on a
+dedicated executor, publishes them through the configured storage backend,
+then stores the largest variant as the user's ``avatar_url`` and deletes the
+temporary file. Job status is kept in Redis, so any worker can answer a
+status poll.
+
+- ``AVATAR_MAX_BYTES`` -- largest accepted upload (default 10 MiB)
+- ``AVATAR_QUEUE_SIZE`` -- queued jobs per worker before uploads are rejected (default 100)
+- ``AVATAR_WORKERS`` -- concurrent jobs and executor size (default 2)
+- ``AVATAR_EXECUTOR`` -- ``process`` or ``thread`` (default ``process``)
+- ``AVATAR_JOB_TTL`` -- seconds a job status is kept (default 86400)
+- ``AVATAR_TMP_DIR`` -- directory of the temporary upload files (default: the system temporary directory)
+
+:module: src.services.avatar_pipeline
+"""
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.database import user_repository
+from src.database.session import open_session, run_db
+from src.security.oauth import get_redis, get_user_cache
+from src.services import avatar_images, tracing
+from src.services.storage import CHUNK_SIZE, get_storage
+
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(10 * 1024 * 1024)))
+AVATAR_QUEUE_SIZE = int(os.getenv("AVATAR_QUEUE_SIZE", "100"))
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", "2"))
+AVATAR_EXECUTOR = os.getenv("AVATAR_EXECUTOR", "process").lower()
+AVATAR_JOB_TTL = int(os.getenv("AVATAR_JOB_TTL", "86400"))
+AVATAR_TMP_DIR = os.getenv("AVATAR_TMP_DIR") or None
+
+logger = logging.getLogger(__name__)
+
+
+class AvatarQueueFull(RuntimeError):
+    """
+    Raised when too many avatar jobs are already queued.
+    """
+
+
+class AvatarTooLarge(ValueError):
+    """
+    Raised when an upload exceeds ``AVATAR_MAX_BYTES``.
+    """
+
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_executor: Executor | None = None
+
+
+def job_key(job_id: str) -> str:
+    """
+    Redis key of a job status.
+    """
+    return f"avatar-job:{job_id}"
+
+
+async def _set_job(job_id: str, **fields) -> None:
+    await get_redis().set(job_key(job_id), json.dumps(fields), ex=AVATAR_JOB_TTL)
+
+
+async def get_job(job_id: str) -> dict | None:
+    """
+    Return the status of a job.
+
+    :param job_id: ID returned by :func:`submit`.
+    :type job_id: str
+    :return: ``status`` (``queued``, ``processing``, ``done`` or ``failed``), ``user_id``
+        and, when done, ``avatar_url`` and ``variants``; None if unknown or expired.
+    :rtype: dict or None
+    """
+    data = await get_redis().get(job_key(job_id))
+    return json.loads(data) if data else None
+
+
+def spool_upload(source) -> str:
+    """
+    Copy an upload to a temporary file in chunks.
+
+    Blocking; run it in the threadpool. The caller owns the file until it is
+    passed to :func:`submit`, and removes it with :func:`discard` on failure.
+
+    :param source: Readable binary file object, positioned at the start.
+    :type source: BinaryIO
+    :return: Path of the temporary file.
+    :rtype: str
+    :raises AvatarTooLarge: If the upload exceeds ``AVATAR_MAX_BYTES``; nothing is left behind.
+    """
+    fd, path = tempfile.mkstemp(prefix="avatar-", dir=AVATAR_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            size = 0
+            while chunk := source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > AVATAR_MAX_BYTES:
+                    raise AvatarTooLarge("Image is too large")
+                target.write(chunk)
+    except BaseException:
+        discard(path)
+        raise
+    return path
+
+
+def discard(path: str) -> None:
+    """
+    Remove a temporary upload file, ignoring files already gone.
+
+    :param path: Path returned by :func:`spool_upload`.
+    :type path: str
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+async def submit(user_id: int, username: str, path: str) -> str:
+    """
+    Queue an uploaded image for processing.
+
+    On success the job owns ``path`` and deletes it when it finishes.
+
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param username: Username, used to invalidate the user cache.
+    :type username: str
+    :param path: Temporary file from :func:`spool_upload`, already checked with :func:`avatar_images.probe`.
+    :type path: str
+    :return: Job ID.
+    :rtype: str
+    :raises AvatarQueueFull: If ``AVATAR_QUEUE_SIZE`` jobs are already queued.
+    :raises RuntimeError: If the pipeline has not been started.
+    """
+    if _queue is None:
+        raise RuntimeError("Avatar pipeline is not running")
+    if _queue.full():
+        raise AvatarQueueFull("Avatar queue is full")
+    job_id = uuid.uuid4().hex
+    await _set_job(job_id, status="queued", user_id=user_id)
+    _queue.put_nowait((job_id, user_id, username, path, tracing.current_context()))
+    return job_id
+
+
+async def _process(job_id: str, user_id: int, username: str, path: str) -> None:
+    """
+    Render, publish and record the avatar of one job.
+    """
+    await _set_job(job_id, status="processing", user_id=user_id)
+    with tracing.span("avatar.render"):
+        variants = await asyncio.get_running_loop().run_in_executor(
+            _executor, avatar_images.render_variants, path)
+    discard(path)
+    storage = get_storage()
+    urls = {}
+    for size, image in variants.items():
+        with tracing.span("storage.put", **{"storage.backend": type(storage).__name__,
+                                            "storage.bytes": len(image)}):
+            urls[str(size)] = await run_in_threadpool(
+                storage.put, f"avatars/{user_id}/{size}", io.BytesIO(image),
+                avatar_images.AVATAR_CONTENT_TYPE)
+    avatar_url = urls[str(max(variants))]
+    async with open_session() as db:
+        await run_db(db, user_repository.update_avatar_url, user_id, avatar_url)
+    await get_user_cache().invalidate(username)
+    await _set_job(job_id, status="done", user_id=user_id,
+                   avatar_url=avatar_url, variants=urls)
+
+
+async def _consume() -> None:
+    """
+    Process queued jobs until cancelled.
+    """
+    while True:
+        job_id, user_id, username, path, trace = await _queue.get()
+        try:
+            # Continue the trace of the upload request
+            with tracing.span("avatar.job", parent=trace, **{"avatar.job_id": job_id}):
+                await _process(job_id, user_id, username, path)
+        except Exception:
+            logger.exception("Avatar job %s failed", job_id)
+            with contextlib.suppress(Exception):
+                await _set_job(job_id, status="failed", user_id=user_id,
+                               error="Avatar processing failed")
+        finally:
+            discard(path)
+            _queue.task_done()
+
+
+def start() -> None:
+    """
+    Create the queue, the executor and the consumer tasks.
+
+    Must be called from the event loop, e.g. in the application lifespan.
+    """
+    global _queue, _executor
+    _queue = asyncio.Queue(maxsize=AVATAR_QUEUE_SIZE)
+    if AVATAR_EXECUTOR == "process":
+        _executor = ProcessPoolExecutor(
+            max_workers=AVATAR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        _executor = ThreadPoolExecutor(
+            max_workers=AVATAR_WORKERS, thread_name_prefix="avatar")
+    _workers.extend(asyncio.create_task(_consume()) for _ in range(AVATAR_WORKERS))
+
+
+async def stop() -> None:
+    """
+    Cancel the consumers and stop the executor. Queued jobs are dropped
+    along with their temporary files.
+    """
+    global _queue, _executor
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    while _queue is not None and not _queue.empty():
+        discard(_queue.get_nowait()[3])
+    _queue = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,106 @@
+"""
+Streaming contact export as CSV or NDJSON.
+
+Rows are read through a server-side cursor and encoded one batch at a time,
+so memory use stays flat and the first bytes go out before the query is
+fully read.
+
+:module: src.services.contact_export
+"""
+import csv
+import io
+import json
+
+from starlette.concurrency import iterate_in_threadpool
+
+from src.database import contacts_repository
+from src.database import session as db_session
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def encode_csv(rows, header: bool = False) -> bytes:
+    """
+    Encode a batch of export rows as CSV.
+
+    :param rows: Rows with the columns of ``contacts_repository.EXPORT_COLUMNS``.
+    :param header: Whether to prepend the header line.
+    :type header: bool
+    :return: UTF-8 encoded CSV chunk.
+    :rtype: bytes
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(contacts_repository.EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(rows) -> bytes:
+    """
+    Encode a batch of export rows as newline-delimited JSON.
+
+    :param rows: Rows with the columns of ``contacts_repository.EXPORT_COLUMNS``.
+    :return: UTF-8 encoded NDJSON chunk.
+    :rtype: bytes
+    """
+    return "".join(
+        json.dumps(dict(zip(contacts_repository.EXPORT_COLUMNS, row)), default=str) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+def _encode(fmt: str, rows, first: bool) -> bytes:
+    """
+    Encode a batch in the requested format.
+    """
+    if fmt == "csv":
+        return encode_csv(rows, header=first)
+    return encode_ndjson(rows)
+
+
+def _iter_sync(user_id: int, fmt: str, batch_size: int):
+    """
+    Produce export chunks from a synchronous session.
+    """
+    with db_session.get_sessionmaker()() as db:
+        first = True
+        for rows in contacts_repository.iter_contacts(db, user_id, batch_size):
+            yield _encode(fmt, rows, first)
+            first = False
+        if first and fmt == "csv":
+            yield encode_csv([], header=True)
+
+
+async def stream_contacts(user_id: int, fmt: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Stream the contacts of a user as encoded chunks.
+
+    The export opens its own session: the request's session is closed before
+    a streaming response starts sending its body.
+
+    :param user_id: ID of the user.
+    :type user_id: int
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :param batch_size: Number of rows fetched and encoded per chunk.
+    :type batch_size: int
+    :return: Async generator of byte chunks.
+    :rtype: AsyncIterator[bytes]
+    """
+    async_session_factory = db_session.get_async_sessionmaker()
+    if async_session_factory is None:
+        async for chunk in iterate_in_threadpool(_iter_sync(user_id, fmt, batch_size)):
+            yield chunk
+        return
+    async with async_session_factory() as db:
+        result = await db.stream(contacts_repository.export_contacts_statement(user_id, batch_size))
+        first = True
+        async for rows in result.partitions():
+            yield _encode(fmt, rows, first)
+            first = False
+        if first and fmt == "csv":
+            yield encode_csv([], header=True)
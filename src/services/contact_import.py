@@ -0,0 +1,227 @@
+"""
+Bulk contact import from CSV, NDJSON and vCard uploads.
+
+Uploads are parsed as a stream of records, validated with ``ContactCreate``
+and written in multi-row batches, so memory use does not grow with the file.
+
+:module: src.services.contact_import
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from src.configuration.schemas import ContactCreate
+from src.database import contacts_repository
+from src.database.session import DBSession, run_db
+
+IMPORT_BATCH_SIZE = 500
+
+FORMATS = ("csv", "ndjson", "vcard")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson",
+              ".vcf": "vcard", ".vcard": "vcard"}
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson",
+                 "application/jsonl": "ndjson", "text/vcard": "vcard",
+                 "text/x-vcard": "vcard"}
+
+
+def detect_format(filename: str | None, content_type: str | None) -> str | None:
+    """
+    Guess the import format from the upload's file name or content type.
+
+    :param filename: Name of the uploaded file.
+    :type filename: str, optional
+    :param content_type: MIME type of the upload.
+    :type content_type: str, optional
+    :return: One of :data:`FORMATS`, or None if it cannot be determined.
+    :rtype: str or None
+    """
+    if filename:
+        for extension, fmt in EXTENSIONS.items():
+            if filename.lower().endswith(extension):
+                return fmt
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+
+def _text_lines(stream):
+    """
+    Decode a binary stream line by line as UTF-8, dropping a leading BOM.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        yield from (line + "\n" for line in lines)
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+def iter_csv(stream):
+    """
+    Yield ``(row, record)`` pairs from a CSV stream with a header row.
+
+    :param stream: Binary file-like object.
+    :return: Generator of 1-based record numbers and field dictionaries.
+    """
+    reader = csv.DictReader(_text_lines(stream))
+    for row, record in enumerate(reader, start=1):
+        yield row, {key.strip(): value for key, value in record.items() if key}
+
+
+def iter_ndjson(stream):
+    """
+    Yield ``(row, record)`` pairs from a newline-delimited JSON stream.
+
+    Lines that are not JSON objects are yielded as error strings.
+
+    :param stream: Binary file-like object.
+    :return: Generator of 1-based line numbers and field dictionaries.
+    """
+    for row, line in enumerate(_text_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row, f"Invalid JSON: {exc.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row, "Expected a JSON object"
+            continue
+        yield row, record
+
+
+def _vcard_record(properties: dict) -> dict:
+    """
+    Map vCard properties onto ``ContactCreate`` fields.
+    """
+    record = {}
+    if "N" in properties:
+        last_name, _, rest = properties["N"].partition(";")
+        record["last_name"] = last_name
+        record["first_name"] = rest.split(";")[0]
+    elif "FN" in properties:
+        first_name, _, last_name = properties["FN"].partition(" ")
+        record["first_name"], record["last_name"] = first_name, last_name
+    if "EMAIL" in properties:
+        record["email"] = properties["EMAIL"]
+    if "TEL" in properties:
+        record["phone"] = properties["TEL"]
+    if "BDAY" in properties:
+        bday = properties["BDAY"]
+        if len(bday) == 8 and bday.isdigit():
+            bday = f"{bday[:4]}-{bday[4:6]}-{bday[6:]}"
+        record["birthday"] = bday
+    if "NOTE" in properties:
+        record["extra_data"] = properties["NOTE"]
+    return record
+
+
+def iter_vcard(stream):
+    """
+    Yield ``(row, record)`` pairs from a vCard stream, one per ``VCARD``.
+
+    Folded lines are unfolded and only the first value of each property is kept.
+
+    :param stream: Binary file-like object.
+    :return: Generator of 1-based card numbers and field dictionaries.
+    """
+    row = 0
+    properties = None
+    current = None
+    for raw_line in _text_lines(stream):
+        line = raw_line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if properties is not None and current:
+                properties[current] += line[1:]
+            continue
+        name, _, value = line.partition(":")
+        name = name.split(";")[0].upper()
+        if name == "BEGIN" and value.upper() == "VCARD":
+            properties, current = {}, None
+        elif name == "END" and value.upper() == "VCARD":
+            if properties is not None:
+                row += 1
+                yield row, _vcard_record(properties)
+            properties, current = None, None
+        elif properties is not None and name:
+            current = name if name not in properties else None
+            if current:
+                properties[name] = value
+
+
+PARSERS = {"csv": iter_csv, "ndjson": iter_ndjson, "vcard": iter_vcard}
+
+
+def _validate(record) -> ContactCreate | str:
+    """
+    Validate a parsed record, returning the contact or an error message.
+    """
+    if isinstance(record, str):
+        return record
+    record = {key: (None if value == "" and key == "extra_data" else value)
+              for key, value in record.items()}
+    try:
+        return ContactCreate.model_validate(record)
+    except ValidationError as exc:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+            for error in exc.errors())
+
+
+def _next_batch(records, batch_size: int) -> list[tuple[int, ContactCreate | str]]:
+    """
+    Parse and validate the next ``batch_size`` records of an upload.
+    """
+    return [(row, _validate(record)) for row, record in islice(records, batch_size)]
+
+
+async def import_contacts(db: DBSession, stream, fmt: str, user_id: int, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Import contacts from an uploaded file for a user.
+
+    Parsing and validation run in the threadpool one batch at a time; each
+    batch of valid rows is written with one multi-row INSERT and committed,
+    so a bad row never aborts the rows around it.
+
+    :param db: SQLAlchemy database session.
+    :type db: AsyncSession | Session
+    :param stream: Binary file-like object with the upload.
+    :param fmt: One of :data:`FORMATS`.
+    :type fmt: str
+    :param user_id: ID of the owner of the contacts.
+    :type user_id: int
+    :param batch_size: Number of records written per INSERT.
+    :type batch_size: int
+    :return: Number of imported and failed rows and the per-row errors.
+    :rtype: dict
+    """
+    records = PARSERS[fmt](stream)
+    imported = 0
+    errors = []
+    while True:
+        batch = await run_in_threadpool(_next_batch, records, batch_size)
+        if not batch:
+            break
+        valid = []
+        for row, result in batch:
+            if isinstance(result, str):
+                errors.append({"row": row, "error": result})
+            else:
+                valid.append((row, result))
+        results = await run_db(db, contacts_repository.bulk_create_contacts,
+                               [contact for _, contact in valid], user_id)
+        for (row, _), error in zip(valid, results):
+            if error is None:
+                imported += 1
+            else:
+                errors.append({"row": row, "error": error})
+    errors.sort(key=lambda error: error["row"])
+    return {"imported": imported, "failed": len(errors), "errors": errors}
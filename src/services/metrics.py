@@ -0,0 +1,168 @@
+"""
+Prometheus metrics.
+
+:class:`MetricsMiddleware` records every HTTP request:
+
+- ``http_requests_total`` -- requests by method, route template and status code
+- ``http_request_duration_seconds`` -- latency histogram by method and route template
+- ``http_requests_in_progress`` -- requests being served
+
+Routes are labelled with their template (``/contacts/{contact_id}``), never
+the raw path, and unknown methods and unmatched paths share one label each,
+so the number of series stays bounded whatever clients send.
+
+:class:`StatsCollector` exposes the counters the service already keeps
+(user cache, response cache, rate limiter, connection pools, SQL
+statements and password hashing) at scrape time, so the hot paths pay nothing extra for them.
+
+Metrics are per worker; scrape every worker or aggregate in Prometheus.
+
+- ``METRICS_ENABLED`` -- ``true`` (default) or ``false`` to drop the middleware and ``/metrics``
+
+:module: src.services.metrics
+"""
+import os
+import time
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from src.database.pool import POOL_STATS
+from src.database.query_stats import QUERY_TOTALS
+from src.security.oauth import get_user_cache
+from src.security.passwords import HASH_STATS
+from src.security.rate_limit import get_limiter
+from src.services import response_cache
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+UNMATCHED = "unmatched"
+
+# Counter names of the snapshots, as label values
+RESULTS = {"l1_hits": "l1_hit", "l2_hits": "l2_hit", "hits": "hit", "misses": "miss", "errors": "error"}
+
+REQUESTS = Counter(
+    "http_requests", "HTTP requests by method, route template and status code.",
+    ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template.",
+    ["method", "route"])
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served.")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency and concurrency.
+
+    Requests that raise are counted with status 500.
+
+    :param app: Wrapped ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.dec()
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED)
+            method = scope["method"] if scope["method"] in METHODS else "OTHER"
+            REQUEST_DURATION.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+
+
+class StatsCollector:
+    """
+    Expose the service's own counters to Prometheus when scraped.
+    """
+
+    def describe(self):
+        # Keeps registration from calling collect(), which creates the Redis client
+        return []
+
+    def collect(self):
+        user_cache = get_user_cache().snapshot()
+        requests = CounterMetricFamily(
+            "user_cache_requests", "User cache lookups by result.", labels=["result"])
+        for result in ("l1_hits", "l2_hits", "misses"):
+            requests.add_metric([RESULTS[result]], user_cache[result])
+        yield requests
+        yield CounterMetricFamily(
+            "user_cache_invalidations", "User cache invalidations.", value=user_cache["invalidations"])
+
+        responses = CounterMetricFamily(
+            "response_cache_requests", "Contact response cache lookups by endpoint and result.",
+            labels=["endpoint", "result"])
+        for endpoint, counters in response_cache.snapshot().items():
+            for result, value in counters.items():
+                responses.add_metric([endpoint, RESULTS[result]], value)
+        yield responses
+
+        limiter = get_limiter().snapshot()
+        decisions = CounterMetricFamily(
+            "rate_limit_decisions", "Rate limit decisions by policy.", labels=["policy", "decision"])
+        for policy, counters in limiter["policies"].items():
+            for decision, value in counters.items():
+                decisions.add_metric([policy, decision], value)
+        yield decisions
+        yield CounterMetricFamily(
+            "rate_limit_local_fallbacks", "Rate limit decisions taken without Redis.",
+            value=limiter["local_fallbacks"])
+
+        in_use = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections in use by engine.", labels=["engine"])
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow", "Overflow connections by engine.", labels=["engine"])
+        events = CounterMetricFamily(
+            "db_pool_events", "Connection pool events by engine.", labels=["engine", "event"])
+        for engine, stats in POOL_STATS.items():
+            pool = stats.snapshot()
+            if pool["checked_out"] is not None:
+                in_use.add_metric([engine], pool["checked_out"])
+            if pool["overflow"] is not None:
+                overflow.add_metric([engine], pool["overflow"])
+            for event in ("checkouts", "connects", "invalidations", "timeouts", "pings"):
+                events.add_metric([engine, event], pool[event])
+        yield in_use
+        yield overflow
+        yield events
+
+        queries = QUERY_TOTALS.snapshot()
+        yield CounterMetricFamily("db_queries", "SQL statements executed.", value=queries["queries"])
+        yield CounterMetricFamily(
+            "db_slow_queries", "SQL statements slower than DB_SLOW_QUERY_MS.",
+            value=queries["slow_queries"])
+        yield CounterMetricFamily(
+            "db_repeated_statements", "Statement shapes run DB_REPEATED_QUERY_THRESHOLD times in one request.",
+            value=queries["repeated_statements"])
+
+        hashing = HASH_STATS.snapshot()
+        yield GaugeMetricFamily(
+            "password_hash_queue_depth", "Password hashing jobs waiting or running.",
+            value=hashing["queue_depth"])
+        jobs = CounterMetricFamily(
+            "password_hash_jobs", "Password hashing jobs by outcome.", labels=["outcome"])
+        jobs.add_metric(["completed"], hashing["completed"])
+        jobs.add_metric(["rejected"], hashing["rejected"])
+        yield jobs
+
+
+REGISTRY.register(StatsCollector())
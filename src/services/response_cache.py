@@ -0,0 +1,144 @@
+"""
+Per-user Redis cache of contact read responses.
+
+Cached bodies are keyed by user, endpoint, normalized query parameters and
+the user's contacts *version*. Writes in ``contacts_repository`` mark the
+owner as changed; :func:`get_contacts_db` bumps the version when the request
+ends, which orphans every cached response of that user in O(1). Orphaned
+entries expire on their own.
+
+- ``CONTACTS_CACHE_TTL`` -- lifetime of a cached response in seconds, 0 disables (default 60)
+
+:module: src.services.response_cache
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from fastapi import Depends, Response
+from redis.exceptions import RedisError
+
+from src.database.contacts_repository import CHANGED_OWNERS_KEY
+from src.database.session import DBSession, get_db
+from src.security import oauth
+
+CONTACTS_CACHE_TTL = int(os.getenv("CONTACTS_CACHE_TTL", "60"))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+STATS = defaultdict(lambda: {"hits": 0, "misses": 0, "errors": 0})
+
+
+def _count(endpoint: str, name: str) -> None:
+    with _lock:
+        STATS[endpoint][name] += 1
+
+
+def snapshot() -> dict:
+    """
+    Return hit/miss counters per endpoint.
+
+    :return: Cache statistics.
+    :rtype: dict
+    """
+    with _lock:
+        return {endpoint: dict(counters) for endpoint, counters in STATS.items()}
+
+
+def version_key(user_id: int) -> str:
+    """
+    Redis key of a user's contacts version counter.
+    """
+    return f"contacts:ver:{user_id}"
+
+
+def response_key(user_id: int, version: str, endpoint: str, params: dict) -> str:
+    """
+    Redis key of a cached response.
+
+    Parameters are sorted and ``None`` values dropped, so equivalent
+    queries share an entry.
+    """
+    query = urlencode(sorted((k, str(v)) for k, v in params.items() if v is not None))
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f"contacts:resp:{user_id}:{version}:{endpoint}:{digest}"
+
+
+async def bump_version(user_id: int) -> None:
+    """
+    Invalidate every cached response of a user.
+
+    :param user_id: ID of the user whose contacts changed.
+    :type user_id: int
+    """
+    await oauth.get_redis().incr(version_key(user_id))
+
+
+async def cached_json(user_id: int, endpoint: str, params: dict, build) -> Response:
+    """
+    Serve a JSON response from the cache, building and storing it on a miss.
+
+    Redis errors are logged and the response is built uncached.
+
+    :param user_id: ID of the current user.
+    :type user_id: int
+    :param endpoint: Name of the endpoint.
+    :type endpoint: str
+    :param params: Query parameters that affect the response.
+    :type params: dict
+    :param build: Coroutine function returning the JSON body and extra headers.
+    :type build: Callable[[], Awaitable[tuple[bytes, dict]]]
+    :return: JSON response.
+    :rtype: Response
+    """
+    if CONTACTS_CACHE_TTL <= 0:
+        body, headers = await build()
+        return Response(body, media_type="application/json", headers=headers)
+    key = None
+    try:
+        version = await oauth.get_redis().get(version_key(user_id)) or "0"
+        key = response_key(user_id, version, endpoint, params)
+        cached = await oauth.get_redis().get(key)
+    except RedisError:
+        logger.warning("Response cache unavailable", exc_info=True)
+        _count(endpoint, "errors")
+        cached = None
+    if cached is not None:
+        _count(endpoint, "hits")
+        headers, _, body = cached.partition("\n")
+        return Response(body, media_type="application/json", headers=json.loads(headers))
+    _count(endpoint, "misses")
+    body, headers = await build()
+    if key is not None:
+        try:
+            await oauth.get_redis().set(key, json.dumps(headers) + "\n" + body.decode(), ex=CONTACTS_CACHE_TTL)
+        except RedisError:
+            logger.warning("Response cache unavailable", exc_info=True)
+            _count(endpoint, "errors")
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def get_contacts_db(db: DBSession = Depends(get_db)):
+    """
+    Dependency providing the request session and invalidating cached reads.
+
+    When the request ends, the version of every user whose contacts were
+    written through ``contacts_repository`` is bumped.
+
+    Yields:
+        AsyncSession | Session: The request's database session.
+    """
+    try:
+        yield db
+    finally:
+        for user_id in db.info.pop(CHANGED_OWNERS_KEY, ()):
+            try:
+                await bump_version(user_id)
+            except RedisError:
+                logger.error("Could not invalidate cached contacts of user %s",
+                             user_id, exc_info=True)
@@ -0,0 +1,162 @@
+"""
+Pluggable storage for uploaded images.
+
+Code that publishes files goes through :func:`get_storage`, so the backend
+is picked by configuration rather than hard-coded:
+
+- ``STORAGE_BACKEND`` -- ``cloudinary`` (default) or ``local``
+- ``STORAGE_LOCAL_ROOT`` -- directory of the local backend (default ``media``)
+- ``STORAGE_PUBLIC_URL`` -- URL prefix of locally stored files (default ``/media``)
+
+:module: src.services.storage
+"""
+import abc
+import functools
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary").lower()
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "media")
+STORAGE_PUBLIC_URL = os.getenv("STORAGE_PUBLIC_URL", "/media").rstrip("/")
+
+CHUNK_SIZE = 64 * 1024
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+MEDIA_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+# Names of locally stored files: sha256 of the content plus an extension
+LOCAL_NAME = re.compile(r"^([0-9a-f]{64})\.(%s)$" % "|".join(MEDIA_TYPES))
+
+
+def _as_stream(source: bytes | BinaryIO) -> BinaryIO:
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+class Storage(abc.ABC):
+    """
+    Interface of a storage backend.
+    """
+
+    @abc.abstractmethod
+    def put(self, key: str, source: bytes | BinaryIO, content_type: str) -> str:
+        """
+        Store a file.
+
+        Called from a worker thread; implementations may block. File objects
+        are read from their current position in chunks, never as a whole.
+
+        :param key: Name of the file, e.g. ``avatars/1/256``.
+        :type key: str
+        :param source: File content or a binary file object.
+        :type source: bytes | BinaryIO
+        :param content_type: MIME type of the content.
+        :type content_type: str
+        :return: Public URL of the stored file.
+        :rtype: str
+        """
+
+
+class CloudinaryStorage(Storage):
+    """
+    Stores files as Cloudinary images.
+
+    The client is imported and configured on first use from
+    ``CLOUDINARY_CLOUD_NAME``, ``CLOUDINARY_API_KEY`` and ``CLOUDINARY_API_SECRET``.
+    """
+
+    @functools.cached_property
+    def uploader(self):
+        """
+        The configured ``cloudinary.uploader`` module.
+        """
+        import cloudinary
+        import cloudinary.uploader
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+        return cloudinary.uploader
+
+    def put(self, key: str, source: bytes | BinaryIO, content_type: str) -> str:
+        folder, _, public_id = key.rpartition("/")
+        result = self.uploader.upload(
+            _as_stream(source), folder=folder or None, public_id=public_id, overwrite=True)
+        return result["secure_url"]
+
+
+class LocalStorage(Storage):
+    """
+    Content-addressed files on the local filesystem.
+
+    A file is named after the SHA-256 of its content, so identical uploads
+    are stored once and a name never changes content, which lets clients
+    cache files forever. The key is only a hint and is not part of the name.
+
+    :param root: Directory holding the files.
+    :type root: str, optional
+    :param base_url: URL prefix of the serving route.
+    :type base_url: str, optional
+    """
+
+    def __init__(self, root: str | None = None, base_url: str | None = None):
+        self.root = Path(root or STORAGE_LOCAL_ROOT)
+        self.base_url = base_url or STORAGE_PUBLIC_URL
+
+    def path(self, name: str) -> Path:
+        """
+        Location of a stored file, sharded by the first two hex digits.
+
+        :param name: File name, ``<sha256>.<extension>``.
+        :type name: str
+        :return: Path of the file.
+        :rtype: Path
+        """
+        return self.root / name[:2] / name
+
+    def put(self, key: str, source: bytes | BinaryIO, content_type: str) -> str:
+        stream = _as_stream(source)
+        incoming = self.root / "incoming"
+        incoming.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as tmp:
+            try:
+                while chunk := stream.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        name = f"{digest.hexdigest()}.{EXTENSIONS.get(content_type, 'bin')}"
+        path = self.path(name)
+        if path.exists():
+            os.unlink(tmp.name)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp.name, path)
+        return f"{self.base_url}/{name}"
+
+
+BACKENDS = {"cloudinary": CloudinaryStorage, "local": LocalStorage}
+
+
+@functools.cache
+def get_storage() -> Storage:
+    """
+    Return the configured storage backend.
+
+    :return: Backend selected by ``STORAGE_BACKEND``.
+    :rtype: Storage
+    :raises ValueError: If the backend name is unknown.
+    """
+    try:
+        return BACKENDS[STORAGE_BACKEND]()
+    except KeyError:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}") from None
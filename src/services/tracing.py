@@ -0,0 +1,316 @@
+"""
+Lightweight request tracing.
+
+:class:`TracingMiddleware` starts a trace for each sampled request, or
+continues the one named by a W3C ``traceparent`` header, and code on the
+request path opens child spans with :func:`span`. The current span lives in
+a context variable, so spans nest across awaits and threadpool calls; work
+handed to a background task can carry :func:`current_context` along and
+continue the trace there.
+
+Finished spans go to the exporter selected by ``TRACE_EXPORTER``. Requests
+that are not sampled, and code running outside any trace, get a shared
+no-op span and cost one context variable lookup per span.
+
+- ``TRACE_EXPORTER`` -- ``none`` (default) or ``jsonl``
+- ``TRACE_FILE`` -- file of the ``jsonl`` exporter (default ``traces.jsonl``)
+- ``TRACE_SAMPLE_RATE`` -- fraction of new traces recorded (default 0.1); an
+  incoming ``traceparent`` keeps the caller's decision
+
+:module: src.services.tracing
+"""
+import abc
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import NamedTuple
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(NamedTuple):
+    """
+    Identity of a span, as carried by ``traceparent``.
+    """
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+    __slots__ = ("name", "context", "parent_id", "attributes", "start_ns", "_start", "duration", "error")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """
+        Attach a value to the span.
+        """
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        """
+        Return the exported form of a finished span.
+
+        :rtype: dict
+        """
+        return {"trace_id": self.context.trace_id, "span_id": self.context.span_id,
+                "parent_id": self.parent_id, "name": self.name,
+                "start_us": self.start_ns // 1000, "duration_ms": round(self.duration * 1000, 3),
+                "status": "error" if self.error else "ok", "error": self.error,
+                "attributes": self.attributes}
+
+
+class _NoopSpan:
+    __slots__ = ()
+    context = None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[SpanContext | None] = contextvars.ContextVar("trace_span", default=None)
+
+
+class SpanExporter(abc.ABC):
+    """
+    Interface of a span exporter.
+    """
+
+    @abc.abstractmethod
+    def export(self, span: dict) -> None:
+        """
+        Send one finished span. Called on the request path; must not block for long.
+
+        :param span: Result of :meth:`Span.to_dict`.
+        :type span: dict
+        """
+
+    def close(self) -> None:
+        """
+        Flush and release resources.
+        """
+
+
+class JsonLinesExporter(SpanExporter):
+    """
+    Appends spans to a local file, one JSON object per line.
+
+    :param path: File to append to.
+    :type path: str, optional
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or TRACE_FILE
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span: dict) -> None:
+        line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+EXPORTERS = {"jsonl": JsonLinesExporter}
+
+
+@functools.cache
+def get_exporter() -> SpanExporter | None:
+    """
+    Return the configured exporter.
+
+    :return: Exporter selected by ``TRACE_EXPORTER``, or None when tracing is off.
+    :rtype: SpanExporter or None
+    :raises ValueError: If the exporter name is unknown.
+    """
+    if TRACE_EXPORTER == "none":
+        return None
+    try:
+        return EXPORTERS[TRACE_EXPORTER]()
+    except KeyError:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {TRACE_EXPORTER!r}") from None
+
+
+def current_context() -> SpanContext | None:
+    """
+    Return the context of the current span, to continue the trace elsewhere.
+
+    :rtype: SpanContext or None
+    """
+    return _current.get()
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+@contextlib.contextmanager
+def span(name: str, parent: SpanContext | None = None, **attributes):
+    """
+    Time a block as a child of the current span (or of ``parent``).
+
+    Outside a sampled trace this yields a no-op span. Exceptions mark the
+    span as failed and propagate.
+
+    :param name: Operation name, e.g. ``db.get_contacts``.
+    :type name: str
+    :param parent: Span to attach to instead of the current one.
+    :type parent: SpanContext, optional
+    :param attributes: Initial span attributes.
+    :return: Context manager yielding the span.
+    """
+    parent = parent or _current.get()
+    if parent is None or not parent.sampled:
+        yield NOOP_SPAN
+        return
+    with _record(Span(name, SpanContext(parent.trace_id, _new_id(64), True),
+                      parent.span_id, attributes)) as recorded:
+        yield recorded
+
+
+@contextlib.contextmanager
+def _record(recorded: Span):
+    token = _current.set(recorded.context)
+    try:
+        yield recorded
+    except BaseException as exc:
+        recorded.error = type(exc).__name__
+        raise
+    finally:
+        _current.reset(token)
+        recorded.duration = time.perf_counter() - recorded._start
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(recorded.to_dict())
+
+
+def start_trace(name: str, traceparent: str | None = None, **attributes):
+    """
+    Open the root span of a request, honouring an incoming ``traceparent``.
+
+    :param name: Operation name.
+    :type name: str
+    :param traceparent: Value of the caller's ``traceparent`` header.
+    :type traceparent: str, optional
+    :return: Context manager yielding the root span, or the no-op span if not sampled.
+    """
+    if get_exporter() is None:
+        return contextlib.nullcontext(NOOP_SPAN)
+    match = TRACEPARENT.match(traceparent or "")
+    if match:
+        sampled = bool(int(match.group(3), 16) & 1)
+    else:
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return _unsampled(match)
+    trace_id, parent_id = (match.group(1), match.group(2)) if match else (_new_id(128), None)
+    return _record(Span(name, SpanContext(trace_id, _new_id(64), True), parent_id, attributes))
+
+
+@contextlib.contextmanager
+def _unsampled(match):
+    # Keep the caller's trace ID so downstream services see one consistent trace
+    context = SpanContext(match.group(1) if match else _new_id(128), _new_id(64), False)
+    token = _current.set(context)
+    try:
+        yield NOOP_SPAN
+    finally:
+        _current.reset(token)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request.
+
+    Sampled responses carry ``X-Trace-Id`` so a slow request can be looked up.
+
+    :param app: Wrapped ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        with start_trace(f"{scope['method']} request", traceparent,
+                         **{"http.method": scope["method"], "http.target": scope["path"]}) as root:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start" and root.context is not None:
+                    root.set_attribute("http.status_code", message["status"])
+                    message["headers"] = [*message.get("headers", []),
+                                          (b"x-trace-id", root.context.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None and root.context is not None:
+                    root.name = f"{scope['method']} {route}"
+                    root.set_attribute("http.route", route)
+
+
+def instrument_routes(app) -> None:
+    """
+    Wrap every API route of an application in a ``handler`` span.
+
+    The span covers dependency resolution, the endpoint and response
+    serialization, but not the middleware.
+
+    :param app: FastAPI application, after its routers are included.
+    """
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.app = _traced_handler(route.app, f"handler {route.path}")
+
+
+def _traced_handler(handler, name: str):
+    async def app(scope, receive, send):
+        with span(name):
+            await handler(scope, receive, send)
+    return app
@@ -0,0 +1,86 @@
+"""
+Bounded in-process cache with per-entry expiry.
+
+:module: src.services.ttl_cache
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a time-to-live.
+
+    When full, the least recently used entry is evicted.
+
+    :param maxsize: Maximum number of entries.
+    :type maxsize: int
+    :param ttl: Default time-to-live of an entry in seconds.
+    :type ttl: float
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return a live entry and mark it as recently used.
+
+        :param key: Cache key.
+        :param default: Value returned on a miss or for an expired entry.
+        :return: Cached value or ``default``.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        """
+        Store an entry, evicting the least recently used one if the cache is full.
+
+        :param key: Cache key.
+        :param value: Value to store.
+        :param ttl: Time-to-live in seconds, defaults to the cache's ``ttl``.
+        :type ttl: float, optional
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        """
+        Remove an entry if present.
+
+        :param key: Cache key.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
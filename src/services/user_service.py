@@ -1,66 +1,37 @@
 """
-User service utilities for authentication, registration, and avatar management.
+User service utilities for authentication and registration.
 
-Provides functions for user creation, authentication, avatar updates, and email verification.
+Provides functions for user creation, authentication, and email verification.
 
 :author: Your Name
 :module: src.services.user_service
 """
-import cloudinary
-import cloudinary.uploader
-import os
 import re
-from sqlalchemy.orm import Session
 
-from authlib.jose import jwt, JoseError
+from authlib.jose import JoseError
 from fastapi import HTTPException
 from fastapi import status
 from src.database import user_repository
+from src.database.session import DBSession, run_db
 from src.security import passwords
 from src.database.models import User, UserRole
-from src.security.oauth import create_access_token
+from src.security.oauth import create_access_token, decode_token, get_user_cache
 
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
-
-
-def update_avatar(db: Session, user: User, file) -> str:
-    """
-    Update the user's avatar using Cloudinary.
-
-    :param db: SQLAlchemy database session.
-    :type db: Session
-    :param user: User object whose avatar will be updated.
-    :type user: User
-    :param file: File object containing the new avatar image.
-    :type file: Any
-    :return: URL of the updated avatar image.
-    :rtype: str
-    """
-    res = cloudinary.uploader.upload(
-        file.file, folder="avatars", public_id=str(user.id), overwrite=True)
-    user.avatar_url = res["secure_url"]
-    db.commit()
-    return user.avatar_url
-
-
-def create_user(db: Session, username: str, password: str, role: str) -> User:
+async def create_user(db: DBSession, username: str, password: str, role: str, timezone: str | None = None) -> User:
     """
     Create a new user with the given credentials and role.
 
     :param db: SQLAlchemy database session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param username: Username (must be a valid email address).
     :type username: str
     :param password: Plain text password.
     :type password: str
     :param role: Role for the new user.
     :type role: UserRole
+    :param timezone: IANA timezone name of the user.
+    :type timezone: str, optional
     :return: The created User object.
     :rtype: User
     :raises HTTPException: If username is invalid or already exists.
@@ -68,12 +39,13 @@ def create_user(db: Session, username: str, password: str, role: str) -> User:
     if not re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", username):
         raise HTTPException(
             status_code=400, detail="Username must be a valid email address")
-    existing = user_repository.get_user_by_username(db, username)
+    existing = await get_user_by_username(db, username)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="User already exists")
-    hashed_password = passwords.get_password_hash(password)
-    user = user_repository.create_user(db, username, hashed_password, role)
+    hashed_password = await passwords.hash_password_async(password)
+    user = await run_db(db, user_repository.create_user,
+                        username, hashed_password, role, timezone)
     # oскільки в нас немає SMTP
     # Генеруємоі JWT токен для email-підтвердження, копіюємо його з консолі і вставляємо в verify-email ендпоінт
     token = create_access_token(
@@ -83,26 +55,29 @@ def create_user(db: Session, username: str, password: str, role: str) -> User:
     return user
 
 
-def get_user_by_username(db: Session, username: str) -> User | None:
+async def get_user_by_username(db: DBSession, username: str) -> User | None:
     """
     Retrieve a user by their username.
 
     :param db: SQLAlchemy database session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param username: Username to search for.
     :type username: str
     :return: User object if found, else None.
     :rtype: User | None
     """
-    return user_repository.get_user_by_username(db, username)
+    return await run_db(db, user_repository.get_user_by_username, username)
 
 
-def authenticate_user(db: Session, username: str, password: str) -> User | None:
+async def authenticate_user(db: DBSession, username: str, password: str) -> User | None:
     """
     Authenticate a user by username and password.
 
+    Stored hashes whose bcrypt cost differs from ``BCRYPT_ROUNDS`` are
+    transparently replaced after a successful login.
+
     :param db: SQLAlchemy database session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param username: Username to authenticate.
     :type username: str
     :param password: Plain text password to verify.
@@ -110,22 +85,47 @@ def authenticate_user(db: Session, username: str, password: str) -> User | None:
     :return: User object if authentication succeeds, else None.
     :rtype: User | None
     """
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not passwords.verify_password(password, user.password):
+    if not await passwords.verify_password_async(password, user.password):
         return None
+    if passwords.needs_rehash(user.password):
+        # Upgrade hashes created with an outdated work factor while we know the password
+        new_hash = await passwords.hash_password_async(password)
+        await run_db(db, user_repository.update_password, user.id, new_hash)
+        passwords.HASH_STATS.record_rehash()
     return user
 
 
-def verify_email_token(token: str, db: Session, secret_key: str) -> str:
+async def reset_password(db: DBSession, username: str, new_password: str) -> None:
+    """
+    Replace a user's password.
+
+    :param db: SQLAlchemy database session.
+    :type db: AsyncSession | Session
+    :param username: Username of the user.
+    :type username: str
+    :param new_password: New plain text password.
+    :type new_password: str
+    :raises HTTPException: If the user is not found.
+    """
+    user = await get_user_by_username(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    hashed_password = await passwords.hash_password_async(new_password)
+    await run_db(db, user_repository.update_password, user.id, hashed_password)
+    await get_user_cache().invalidate(user.username)
+
+
+async def verify_email_token(token: str, db: DBSession, secret_key: str) -> str:
     """
     Verify an email confirmation token and mark the user as verified.
 
     :param token: JWT token for email verification.
     :type token: str
     :param db: SQLAlchemy database session.
-    :type db: Session
+    :type db: AsyncSession | Session
     :param secret_key: Secret key for decoding the token.
     :type secret_key: str
     :return: Confirmation message if verification succeeds.
@@ -133,16 +133,15 @@ def verify_email_token(token: str, db: Session, secret_key: str) -> str:
     :raises HTTPException: If token is invalid, expired, or user not found.
     """
     try:
-        claims = jwt.decode(token, secret_key)
-        claims.validate()
+        claims = decode_token(token, secret_key)
         username = claims.get('sub')
         if claims.get('action') != 'verify_email':
             raise HTTPException(status_code=400, detail="Invalid token action")
     except JoseError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-    user = db.query(User).filter_by(username=username).first()
+    user = await get_user_by_username(db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user.is_verified = True
-    db.commit()
+    await run_db(db, user_repository.set_verified, user.id)
+    await get_user_cache().invalidate(user.username)
     return "Email verified!"
@@ -3,10 +3,17 @@ Integration tests for FastAPI routes using pytest and TestClient.
 """
 import pytest
 from fastapi.testclient import TestClient
-from src.main import app
+from src.main import create_app
 from src.configuration.schemas import ContactCreate
 
-client = TestClient(app)
+client = TestClient(create_app())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app_lifespan():
+    # Runs the startup warm-up (which creates the tables) and the shutdown
+    with client:
+        yield
 
 
 def get_token():
@@ -50,6 +57,37 @@ def test_create_contact():
     assert response.json()["first_name"] == "John"
 
 
+def test_import_contacts():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    csv_data = (b"first_name,last_name,email,phone,birthday,extra_data\n"
+                b"Imported,One,imported.one@example.com,4440001,1991-04-04,\n"
+                b"Imported,Two,not-an-email,4440002,1991-04-04,\n"
+                b"Imported,Three,imported.one@example.com,4440003,1991-04-04,\n")
+    files = {"file": ("contacts.csv", csv_data, "text/csv")}
+    response = client.post("/contacts/import", headers=headers, files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["failed"] >= 2
+    assert [error["row"] for error in body["errors"]][-2:] == [2, 3]
+    files = {"file": ("contacts.bin", b"", "application/octet-stream")}
+    response = client.post("/contacts/import", headers=headers, files=files)
+    assert response.status_code == 400
+
+
+def test_export_contacts():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/contacts/export?format=csv", headers=headers)
+    assert response.status_code == 200
+    assert response.text.startswith("id,first_name,last_name,email")
+    response = client.get("/contacts/export?format=ndjson", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    response = client.get("/contacts/export?format=xml", headers=headers)
+    assert response.status_code == 422
+
+
 def test_read_contacts():
     token = get_token()
     headers = {"Authorization": f"Bearer {token}"}
@@ -58,6 +96,50 @@ def test_read_contacts():
     assert isinstance(response.json(), list)
 
 
+def test_read_contacts_cursor():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/contacts/?limit=1", headers=headers)
+    assert response.status_code == 200
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        next_page = client.get(
+            f"/contacts/?limit=1&after={cursor}", headers=headers)
+        assert next_page.status_code == 200
+        assert next_page.json()[0]["id"] > response.json()[0]["id"]
+    response = client.get("/contacts/?after=bogus", headers=headers)
+    assert response.status_code == 400
+    from src.database.contacts_repository import encode_cursor
+    overflow = encode_cursor(2**63)
+    response = client.get(f"/contacts/?after={overflow}", headers=headers)
+    assert response.status_code == 400
+
+
+def test_read_contacts_invalid_limit():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    for limit in (0, -1, 501):
+        response = client.get(f"/contacts/?limit={limit}", headers=headers)
+        assert response.status_code == 422
+
+
+def test_read_contacts_skip_last_page():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(3):
+        client.post("/contacts/", json={
+            "first_name": "Page", "last_name": f"Skip{i}", "email": f"skip{i}@example.com",
+            "phone": f"44400{i}", "birthday": "1990-01-01", "extra_data": None}, headers=headers)
+    total = len(client.get("/contacts/?limit=500", headers=headers).json())
+    # A page that ends exactly on the last contact has no next page
+    response = client.get(f"/contacts/?skip=1&limit={total - 1}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == total - 1
+    assert "X-Next-Cursor" not in response.headers
+    response = client.get(f"/contacts/?skip=1&limit={total - 2}", headers=headers)
+    assert "X-Next-Cursor" in response.headers
+
+
 def test_update_contact():
     token = get_token()
     headers = {"Authorization": f"Bearer {token}"}
@@ -79,6 +161,14 @@ def test_update_contact():
         f"/contacts/{contact_id}", json=update, headers=headers)
     assert response.status_code == 200
     assert response.json()["first_name"] == "Janet"
+    response = client.patch(
+        f"/contacts/{contact_id}", json={"phone": "9876500000"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Janet"
+    assert response.json()["phone"] == "9876500000"
+    response = client.patch(
+        f"/contacts/{contact_id}", json={"email": None}, headers=headers)
+    assert response.status_code == 422
 
 
 def test_delete_contact():
@@ -101,12 +191,49 @@ def test_delete_contact():
     assert response.json()["id"] == contact_id
 
 
+def test_batch_contacts():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = []
+    for i in range(3):
+        contact = {
+            "first_name": f"Batch{i}",
+            "last_name": "Member",
+            "email": f"batch{i}@example.com",
+            "phone": f"70000000{i}",
+            "birthday": "1991-03-03",
+            "extra_data": None
+        }
+        ids.append(client.post("/contacts/", json=contact,
+                   headers=headers).json()["id"])
+    response = client.patch("/contacts/batch", json=[
+        {"id": ids[0], "last_name": "Moved"},
+        {"id": ids[1], "last_name": "Moved"},
+        {"id": ids[2], "email": "batch0@example.com"},
+        {"id": 999999, "last_name": "Nobody"},
+    ], headers=headers)
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == [
+        "updated", "updated", "conflict", "not_found"]
+    assert client.get(f"/contacts/{ids[1]}", headers=headers).json()[
+        "last_name"] == "Moved"
+    response = client.request(
+        "DELETE", "/contacts/batch", json=ids[:2] + [999999], headers=headers)
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == [
+        "deleted", "deleted", "not_found"]
+    assert client.get(f"/contacts/{ids[0]}", headers=headers).status_code == 404
+
+
 def test_search_contacts():
     token = get_token()
     headers = {"Authorization": f"Bearer {token}"}
     response = client.get("/contacts/search/?first_name=John", headers=headers)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+    response = client.get("/contacts/search/?q=john&limit=5", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) <= 5
 
 
 def test_upcoming_birthdays():
@@ -115,6 +242,9 @@ def test_upcoming_birthdays():
     response = client.get("/contacts/upcoming_birthdays/", headers=headers)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+    response = client.get(
+        "/contacts/upcoming_birthdays/?days=30", headers=headers)
+    assert response.status_code == 200
 
 
 def test_get_me_unauth():
@@ -122,6 +252,16 @@ def test_get_me_unauth():
     assert response.status_code == 401
 
 
+def test_me_rate_limit():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    statuses = [client.get("/me", headers=headers).status_code for _ in range(6)]
+    assert statuses[0] == 200
+    assert statuses[-1] == 429
+    response = client.get("/me", headers=headers)
+    assert int(response.headers["Retry-After"]) >= 1
+
+
 def test_contacts_list_unauth():
     response = client.get("/contacts/")
     assert response.status_code == 401
@@ -142,7 +282,56 @@ def test_avatar_upload_admin():
     files = {"file": ("avatar.png", file_content, "image/png")}
     resp = client.post("/users/avatar", headers=headers, files=files)
     # 403 if not admin, 422 if file handling fails
-    assert resp.status_code in (200, 401, 403, 422)
+    assert resp.status_code in (200, 202, 401, 403, 422)
+
+
+def test_avatar_background_job(tmp_path, monkeypatch, request):
+    import io
+    import time
+    from PIL import Image
+    from src.services import avatar_pipeline, storage
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(storage, "STORAGE_LOCAL_ROOT", str(tmp_path / "media"))
+    monkeypatch.setattr(avatar_pipeline, "AVATAR_TMP_DIR", str(tmp_path))
+    storage.get_storage.cache_clear()
+    request.addfinalizer(storage.get_storage.cache_clear)
+    client.post("/users", json={"username": "avatar-admin@example.com",
+                "password": "adminpass", "role": "ADMIN"})
+    token = client.post(
+        "/token", data={"username": "avatar-admin@example.com", "password": "adminpass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    image = io.BytesIO()
+    Image.new("RGB", (800, 600), "navy").save(image, "PNG")
+    files = {"file": ("avatar.png", image.getvalue(), "image/png")}
+    resp = client.post("/users/avatar", headers=headers, files=files)
+    assert resp.status_code == 202
+    status_url = resp.headers["Location"]
+    assert status_url.endswith(resp.json()["job_id"])
+    for _ in range(300):
+        job = client.get(status_url, headers=headers).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.1)
+    assert job["status"] == "done"
+    assert set(job["variants"]) == {"512", "256", "64"}
+    # The temporary upload file is removed once the job is done
+    assert [entry.name for entry in tmp_path.iterdir()] == ["media"]
+    media = client.get(job["avatar_url"])
+    assert media.status_code == 200
+    assert media.headers["content-type"] == "image/jpeg"
+    assert "immutable" in media.headers["cache-control"]
+    etag = media.headers["etag"]
+    assert etag == '"%s"' % job["avatar_url"].rsplit("/", 1)[1].split(".")[0]
+    assert client.get(job["avatar_url"], headers={"If-None-Match": etag}).status_code == 304
+    part = client.get(job["avatar_url"], headers={"Range": "bytes=0-9"})
+    assert part.status_code == 206
+    assert part.content == media.content[:10]
+    assert client.get("/media/" + "0" * 64 + ".jpg").status_code == 404
+    assert client.get("/media/..%2Fsecret.jpg").status_code == 404
+    resp = client.post("/users/avatar", headers=headers,
+                       files={"file": ("avatar.png", b"not an image", "image/png")})
+    assert resp.status_code == 422
+    assert client.get("/users/avatar/jobs/unknown", headers=headers).status_code == 404
 
 
 def test_email_verification():
@@ -198,3 +387,81 @@ def test_refresh_token():
     refresh_token = response.json().get("refresh_token")
     resp = client.post("/refresh", json={"refresh_token": refresh_token})
     assert resp.status_code in (200, 422)  # 422 if validation error
+
+
+def test_internal_pool_stats():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/internal/pool", headers=headers).status_code == 401
+    client.post("/users", json={"username": "poolstats@example.com",
+                                "password": "adminpass", "role": "ADMIN"})
+    response = client.post(
+        "/token", data={"username": "poolstats@example.com", "password": "adminpass"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = client.get("/internal/pool", headers=headers)
+    assert response.status_code == 200
+    assert "checkouts" in response.json()["sync"]
+    response = client.get("/internal/password-hashing", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["completed"] > 0
+
+
+def test_metrics():
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/contacts/", headers=headers)
+    client.get("/contacts/987654", headers=headers)
+    client.get("/no-such-page")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/contacts/{contact_id}",status="404"}' in text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/contacts/"}' in text
+    assert 'route="unmatched",status="404"' in text
+    assert "/no-such-page" not in text
+    assert "http_requests_in_progress" in text
+    assert 'user_cache_requests_total{result="l1_hit"}' in text
+    assert "rate_limit_local_fallbacks_total" in text
+
+
+def test_db_query_headers(monkeypatch):
+    from src.database import query_stats
+    token = get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert "X-DB-Query-Count" not in client.get("/contacts/987654", headers=headers).headers
+    monkeypatch.setattr(query_stats, "DEBUG", True)
+    response = client.get("/contacts/987654", headers=headers)
+    assert int(response.headers["X-DB-Query-Count"]) >= 1
+    assert float(response.headers["X-DB-Time"]) > 0
+
+
+def test_tracing(tmp_path, monkeypatch):
+    import json
+    from src.services import tracing
+    with pytest.raises(TypeError):
+        type("Incomplete", (tracing.SpanExporter,), {})()
+    exporter = tracing.JsonLinesExporter(str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "get_exporter", lambda: exporter)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    get_token()
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.post(
+        "/token", data={"username": "testuser@example.com", "password": "testpass"},
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert response.headers["X-Trace-Id"] == trace_id
+    token = response.json()["access_token"]
+    response = client.get("/contacts/", headers={"Authorization": f"Bearer {token}",
+                                                 "traceparent": f"00-{'1' * 32}-{'2' * 16}-00"})
+    assert "X-Trace-Id" not in response.headers
+    exporter.close()
+    spans = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+    assert {span["trace_id"] for span in spans} == {trace_id}
+    by_name = {span["name"]: span for span in spans}
+    root = by_name["POST /token"]
+    assert root["parent_id"] == "00f067aa0ba902b7"
+    assert root["attributes"]["http.status_code"] == 200
+    handler = by_name["handler /token"]
+    assert handler["parent_id"] == root["span_id"]
+    assert by_name["db.get_user_by_username"]["parent_id"] == handler["span_id"]
+    assert by_name["bcrypt.verify_password"]["parent_id"] == handler["span_id"]
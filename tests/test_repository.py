@@ -1,11 +1,16 @@
 """
 Tests for repository layer using in-memory SQLite database.
 """
+import asyncio
 import pytest
+from datetime import date
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from src.database.models import Base, User, UserRole, Contact
 from src.database import user_repository, contacts_repository
+from src.database.session import run_db
+from src.database.pool import PoolStats, TimedQueuePool, instrument
 from src.security import passwords
 from src.configuration.schemas import ContactCreate
 
@@ -65,6 +70,415 @@ def test_delete_user(in_memory_db):
     assert deleted is None
 
 
+def test_run_db_sync_fallback():
+    # run_db dispatches to a worker thread, so share one in-memory connection
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    password = passwords.get_password_hash("pass")
+    user = asyncio.run(run_db(db, user_repository.create_user,
+                              "rundb@example.com", password, UserRole.USER))
+    fetched = asyncio.run(
+        run_db(db, user_repository.get_user_by_username, "rundb@example.com"))
+    assert fetched.id == user.id
+    db.close()
+
+
+def test_run_db_async_session():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            await run_db(db, user_repository.create_user,
+                         "asyncdb@example.com", "hash", UserRole.USER)
+            fetched = await run_db(db, user_repository.get_user_by_username,
+                                   "asyncdb@example.com")
+        await engine.dispose()
+        return fetched
+
+    assert asyncio.run(scenario()).username == "asyncdb@example.com"
+
+
+def test_password_hashing_executor():
+    hashed = passwords.get_password_hash("secret", rounds=4)
+    assert passwords.needs_rehash(hashed) == (passwords.BCRYPT_ROUNDS != 4)
+    assert not passwords.needs_rehash(passwords.get_password_hash("secret"))
+    assert passwords.needs_rehash("plain-text")
+    completed = passwords.HASH_STATS.snapshot()["completed"]
+    assert asyncio.run(passwords.verify_password_async("secret", hashed))
+    assert not asyncio.run(passwords.verify_password_async("wrong", hashed))
+    snapshot = passwords.HASH_STATS.snapshot()
+    assert snapshot["completed"] == completed + 2
+    assert snapshot["queue_depth"] == 0
+
+
+def test_rehash_on_login():
+    from src.services import user_service
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    outdated_rounds = 4 if passwords.BCRYPT_ROUNDS != 4 else 5
+    user_repository.create_user(db, "rehash@example.com", passwords.get_password_hash(
+        "secret", rounds=outdated_rounds), UserRole.USER)
+    user = asyncio.run(user_service.authenticate_user(
+        db, "rehash@example.com", "secret"))
+    assert user is not None
+    db.expire_all()
+    stored = user_repository.get_user_by_username(db, "rehash@example.com")
+    assert not passwords.needs_rehash(stored.password)
+    assert passwords.verify_password("secret", stored.password)
+    db.close()
+
+
+def test_ttl_cache():
+    from src.services.ttl_cache import TTLCache
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+
+def test_user_cache_tiers():
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.security.user_cache import UserCache
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        worker_a = UserCache(fakeredis.FakeAsyncRedis(
+            server=server, decode_responses=True))
+        worker_b = UserCache(fakeredis.FakeAsyncRedis(
+            server=server, decode_responses=True))
+        listener = asyncio.create_task(worker_b.listen())
+        await asyncio.sleep(0.05)
+        await worker_a.set("cached@example.com", {"id": 1})
+        assert await worker_b.get("cached@example.com") == {"id": 1}
+        assert await worker_b.get("cached@example.com") == {"id": 1}
+        await worker_a.invalidate("cached@example.com")
+        await asyncio.sleep(0.05)
+        result = await worker_b.get("cached@example.com")
+        listener.cancel()
+        return result, worker_b.snapshot()
+
+    result, stats = asyncio.run(scenario())
+    assert result is None
+    assert stats["l2_hits"] == 1
+    assert stats["l1_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_batch_update_and_delete_contacts(in_memory_db):
+    from src.configuration.schemas import ContactBatchUpdate
+    db = in_memory_db
+    user = user_repository.create_user(
+        db, "batch@example.com", "hash", UserRole.USER)
+    other = user_repository.create_user(
+        db, "batch-other@example.com", "hash", UserRole.USER)
+    ids = [contacts_repository.create_contact(db, ContactCreate(
+        first_name=f"B{i}", last_name="Same", email=f"b{i}@example.com",
+        phone=f"80{i}", birthday=date(1990, 1, 1)), user.id).id for i in range(3)]
+    foreign = contacts_repository.create_contact(db, ContactCreate(
+        first_name="F", last_name="Other", email="f@example.com",
+        phone="999", birthday=date(1990, 1, 1)), other.id).id
+    results = contacts_repository.batch_update_contacts(db, [
+        ContactBatchUpdate(id=ids[0], first_name="One"),
+        ContactBatchUpdate(id=ids[1], first_name="Two",
+                           birthday=date(2000, 12, 31)),
+        ContactBatchUpdate(id=ids[2], first_name="Three"),
+        ContactBatchUpdate(id=ids[2], email="b0@example.com"),
+        ContactBatchUpdate(id=foreign, first_name="Stolen"),
+    ], user.id)
+    assert [r["status"] for r in results] == [
+        "updated", "updated", "updated", "conflict", "not_found"]
+    db.expire_all()
+    assert [contacts_repository.get_contact(db, i, user.id).first_name for i in ids] == [
+        "One", "Two", "Three"]
+    assert contacts_repository.get_contact(db, ids[1], user.id).birthday_key == 1231
+    assert contacts_repository.get_contact(db, foreign, other.id).first_name == "F"
+    # A rejected item does not claim the email it asked for
+    results = contacts_repository.batch_update_contacts(db, [
+        ContactBatchUpdate(id=ids[0], email="new@example.com", phone="801"),
+        ContactBatchUpdate(id=ids[1], email="new@example.com"),
+    ], user.id)
+    assert [r["status"] for r in results] == ["conflict", "updated"]
+    assert results[0]["error"] == "Phone already exists: 801"
+    db.expire_all()
+    assert contacts_repository.get_contact(db, ids[1], user.id).email == "new@example.com"
+    results = contacts_repository.batch_delete_contacts(
+        db, [ids[0], foreign, ids[0]], user.id)
+    assert [r["status"] for r in results] == ["deleted", "not_found", "conflict"]
+    assert contacts_repository.get_contact(db, ids[0], user.id) is None
+
+
+def test_response_cache_version_invalidation(in_memory_db):
+    fakeredis = pytest.importorskip("fakeredis")
+    from unittest import mock
+    from src.services import response_cache
+    db = in_memory_db
+    user = user_repository.create_user(
+        db, "respcache@example.com", "hash", UserRole.USER)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return b"[]", {"X-Next-Cursor": "abc"}
+
+    async def scenario():
+        first = await response_cache.cached_json(user.id, "read_contacts", {"limit": 10, "after": None}, build)
+        second = await response_cache.cached_json(user.id, "read_contacts", {"after": None, "limit": 10}, build)
+        gen = response_cache.get_contacts_db(db)
+        await gen.__anext__()
+        contacts_repository.create_contact(db, ContactCreate(
+            first_name="Cache", last_name="Bust", email="bust@example.com",
+            phone="555", birthday=date(1990, 1, 1)), user.id)
+        await gen.aclose()
+        await response_cache.cached_json(user.id, "read_contacts", {"limit": 10}, build)
+        return first, second
+
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with mock.patch.object(response_cache.oauth, "get_redis", return_value=client):
+        first, second = asyncio.run(scenario())
+    assert len(builds) == 2
+    assert second.body == first.body == b"[]"
+    assert second.headers["X-Next-Cursor"] == "abc"
+    assert response_cache.snapshot()["read_contacts"]["hits"] >= 1
+
+
+def test_rate_limiter_token_bucket():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from redis.exceptions import ConnectionError
+    from src.configuration.rate_limits import RateLimitPolicy
+    from src.security.rate_limit import RateLimiter
+    policy = RateLimitPolicy.parse("2/minute")
+    buckets = [("rl:test:0:ip:1.2.3.4", policy)]
+
+    async def scenario(limiter):
+        return [await limiter.take("test", buckets) for _ in range(3)]
+
+    shared = fakeredis.FakeAsyncRedis()
+    results = asyncio.run(scenario(RateLimiter(shared)))
+    assert results[:2] == [0, 0]
+    assert 0 < results[2] <= 30
+    assert asyncio.run(scenario(RateLimiter(shared)))[0] > 0
+
+    broken = fakeredis.FakeAsyncRedis()
+    limiter = RateLimiter(broken)
+
+    async def unavailable(**kwargs):
+        raise ConnectionError()
+
+    limiter.script = unavailable
+    results = asyncio.run(scenario(limiter))
+    assert results[:2] == [0, 0] and results[2] > 0
+    assert limiter.snapshot()["local_fallbacks"] == 3
+    assert limiter.snapshot()["policies"]["test"] == {"allowed": 2, "rejected": 1}
+
+
+def test_migrations_match_models(tmp_path):
+    from pathlib import Path
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = Config(str(Path(__file__).resolve().parents[1] / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={
+            "include_name": lambda name, type_, parents: not (type_ == "table" and name.startswith("contacts_fts"))})
+        diff = [change for change in compare_metadata(context, Base.metadata)
+                if not (change[0] == "add_index" and change[1].name.endswith("_trgm"))]
+        assert diff == []
+        tables = {row[0] for row in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "contacts_fts" in tables
+    command.downgrade(config, "base")
+
+
+def test_render_avatar_variants():
+    import io
+    PIL = pytest.importorskip("PIL")
+    from PIL import Image
+    from src.services import avatar_images
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees: stored landscape, displayed portrait
+    exif[0x010F] = "Camera Maker"
+    source = io.BytesIO()
+    Image.new("RGB", (400, 200), "red").save(
+        source, "JPEG", exif=exif, comment=b"private note", icc_profile=b"\0" * 128)
+    assert avatar_images.probe(source.getvalue()) == "JPEG"
+    variants = avatar_images.render_variants(source.getvalue(), sizes=(128, 32))
+    assert sorted(variants) == [32, 128]
+    for size, data in variants.items():
+        # COM segment marker, and the comment itself
+        assert b"\xff\xfe" not in data and b"private note" not in data
+        with Image.open(io.BytesIO(data)) as variant:
+            assert variant.size == (size, size)
+            assert not variant.getexif()
+            assert "icc_profile" not in variant.info
+            assert "comment" not in variant.info
+    with pytest.raises(ValueError):
+        avatar_images.probe(b"not an image")
+
+
+def test_spool_avatar_upload(tmp_path, monkeypatch):
+    import io
+    pytest.importorskip("PIL")
+    from PIL import Image
+    from src.services import avatar_images, avatar_pipeline
+    monkeypatch.setattr(avatar_pipeline, "AVATAR_TMP_DIR", str(tmp_path))
+    source = io.BytesIO()
+    Image.new("RGB", (300, 200), "blue").save(source, "PNG")
+    source.seek(0)
+    path = avatar_pipeline.spool_upload(source)
+    assert sorted(avatar_images.render_variants(path, sizes=(64,))) == [64]
+    avatar_pipeline.discard(path)
+    avatar_pipeline.discard(path)
+    monkeypatch.setattr(avatar_pipeline, "AVATAR_MAX_BYTES", 100)
+    source.seek(0)
+    with pytest.raises(avatar_pipeline.AvatarTooLarge):
+        avatar_pipeline.spool_upload(source)
+    assert not list(tmp_path.iterdir())
+
+
+def test_local_storage_deduplicates(tmp_path):
+    import io
+    from src.services import storage
+    local = storage.LocalStorage(root=str(tmp_path), base_url="/media")
+    data = b"avatar" * 50000
+    url = local.put("avatars/1/512", data, "image/jpeg")
+    name = url.rsplit("/", 1)[1]
+    assert storage.LOCAL_NAME.match(name)
+    assert local.path(name).read_bytes() == data
+    # Streams are read in chunks and land on the same content-addressed file
+    assert local.put("avatars/2/512", io.BytesIO(data), "image/jpeg") == url
+    assert [p.name for p in tmp_path.rglob("*.jpg")] == [name]
+    assert not any((tmp_path / "incoming").iterdir())
+
+    class Incomplete(storage.Storage):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_query_stats_repeated_statements(caplog):
+    import json
+    from sqlalchemy import text
+    from src.database import query_stats
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    query_stats.instrument_queries(engine)
+    assert query_stats.statement_shape("SELECT *\n FROM t WHERE id IN (?, ?, ?)") == \
+        "SELECT * FROM t WHERE id IN (?)"
+
+    async def app(scope, receive, send):
+        with engine.connect() as connection:
+            for value in range(12):
+                connection.execute(text("SELECT :value"), {"value": value})
+            connection.execute(text("SELECT 1 WHERE 1 IN (1, 2)"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = query_stats.QueryStatsMiddleware(app)
+    before = query_stats.QUERY_TOTALS.snapshot()
+    with pytest.MonkeyPatch.context() as monkeypatch, caplog.at_level("WARNING", logger=query_stats.__name__):
+        monkeypatch.setattr(query_stats, "DEBUG", True)
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/n-plus-one"}, None, send))
+    headers = dict(messages[0]["headers"])
+    assert headers[b"x-db-query-count"] == b"13"
+    assert float(headers[b"x-db-time"]) >= 0
+    repeated = [json.loads(record.message) for record in caplog.records]
+    assert repeated == [{"event": "repeated_query", "route": "/n-plus-one", "method": "GET",
+                         "executions": 12, "statement": "SELECT ?"}]
+    after = query_stats.QUERY_TOTALS.snapshot()
+    assert after["queries"] - before["queries"] == 13
+    assert after["repeated_statements"] - before["repeated_statements"] == 1
+
+
+def test_dump_contacts_matches_schema(in_memory_db):
+    from pydantic import TypeAdapter
+    from src.configuration.schemas import ContactOut
+    from src.routers.contacts import _dump_contacts
+    db = in_memory_db
+    contacts_repository.create_contact(db, ContactCreate(
+        first_name="Олена", last_name="O'Brien \"Jr\"", email="olena@example.com", phone="+380501234567",
+        birthday=date(1990, 2, 28), extra_data="note"), user_id=1)
+    contacts_repository.create_contact(db, ContactCreate(
+        first_name="Taras", last_name="Melnyk", email="taras@example.com", phone="+380501234568",
+        birthday=date(1985, 12, 31)), user_id=1)
+    contacts = contacts_repository.get_contacts(db, user_id=1)
+    adapter = TypeAdapter(list[ContactOut])
+    assert _dump_contacts(contacts) == adapter.dump_json(adapter.validate_python(contacts, from_attributes=True))
+    assert _dump_contacts([]) == b"[]"
+
+
+def test_decode_token_cache():
+    from unittest import mock
+    from authlib.jose import JoseError
+    from src.security import oauth
+    token = oauth.create_access_token({"sub": "claims@example.com"})
+    claims = oauth.decode_token(token)
+    assert claims["sub"] == "claims@example.com"
+    with mock.patch.object(oauth.jwt, "decode", side_effect=AssertionError("not cached")):
+        assert oauth.decode_token(token) is claims
+    with pytest.raises(JoseError):
+        oauth.decode_token(token, "another-secret")
+    with pytest.raises(JoseError):
+        oauth.decode_token(token[:-2] + "xx")
+
+
+def test_pool_stats():
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0)
+    stats = PoolStats()
+    instrument(engine, stats)
+    with engine.connect() as conn:
+        assert stats.snapshot()["checked_out"] == 1
+        conn.connection.invalidate()
+    with engine.connect():
+        pass
+    snapshot = stats.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["connects"] == 2
+    assert snapshot["invalidations"] == 1
+    assert snapshot["wait_count"] == 2
+    assert snapshot["checked_out"] == 0
+    assert snapshot["peak_checked_out"] == 1
+    engine.dispose()
+
+
+def test_pool_stats_peak_between_snapshots():
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool,
+                           pool_size=2, max_overflow=1)
+    stats = PoolStats()
+    instrument(engine, stats)
+    with engine.connect(), engine.connect(), engine.connect():
+        pass
+    snapshot = stats.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["peak_checked_out"] == 3
+    engine.dispose()
+
+
 # Contacts repository tests
 
 
@@ -89,6 +503,30 @@ def test_create_and_get_contact(in_memory_db):
     assert fetched.email == "john@example.com"
 
 
+def test_update_and_delete_contact_returning(in_memory_db):
+    from src.configuration.schemas import ContactPatch, ContactUpdate
+    db = in_memory_db
+    user = user_repository.create_user(
+        db, "returning@example.com", "hash", UserRole.USER)
+    contact = contacts_repository.create_contact(db, ContactCreate(
+        first_name="Ret", last_name="Urning", email="ret@example.com",
+        phone="321", birthday=date(1990, 2, 3), extra_data="keep"), user.id)
+    assert contact.birthday_key == 203
+    patched = contacts_repository.update_contact(
+        db, contact.id, ContactPatch(birthday=date(1990, 7, 8)), user.id)
+    assert patched.extra_data == "keep"
+    assert patched.birthday_key == 708
+    replaced = contacts_repository.update_contact(db, contact.id, ContactUpdate(
+        first_name="Ret", last_name="Urning", email="ret@example.com",
+        phone="321", birthday=date(1990, 7, 8)), user.id)
+    assert replaced.extra_data is None
+    assert contacts_repository.update_contact(
+        db, 999, ContactPatch(first_name="X"), user.id) is None
+    deleted = contacts_repository.delete_contact(db, contact.id, user.id)
+    assert deleted.email == "ret@example.com"
+    assert contacts_repository.delete_contact(db, contact.id, user.id) is None
+
+
 def test_contact_not_found(in_memory_db):
     db = in_memory_db
     # Create user for user_id context
@@ -114,8 +552,175 @@ def test_get_contacts(in_memory_db):
             extra_data=None
         )
         contacts_repository.create_contact(db, contact_data, user.id)
-    result = contacts_repository.get_contacts(db, user.id)
+    user_id = user.id
+    db.expunge_all()
+    result = contacts_repository.get_contacts(db, user_id)
     assert len(result) == 3
+    # Column projection: plain rows, nothing loaded into the session
+    assert result[0]._fields == contacts_repository.CONTACT_COLUMNS
+    assert result[0].email == "email0@example.com"
+    assert len(db.identity_map) == 0
+
+
+def test_get_contacts_keyset_pagination(in_memory_db):
+    db = in_memory_db
+    username = "pagecontacts@example.com"
+    password = passwords.get_password_hash("pass")
+    user = user_repository.create_user(db, username, password, UserRole.USER)
+    for i in range(5):
+        contact_data = ContactCreate(
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            email=f"page{i}@example.com",
+            phone=f"55500{i}",
+            birthday="2000-01-01",
+            extra_data=None
+        )
+        contacts_repository.create_contact(db, contact_data, user.id)
+    seen = []
+    after_id = None
+    while True:
+        page, cursor = contacts_repository.get_contacts_after(
+            db, user.id, after_id=after_id, limit=2)
+        seen.extend(contact.id for contact in page)
+        if cursor is None:
+            break
+        after_id = contacts_repository.decode_cursor(cursor)
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+    assert contacts_repository.get_contacts_after(db, user.id, limit=0) == ([], None)
+    with pytest.raises(ValueError):
+        contacts_repository.decode_cursor("not-a-cursor")
+    for out_of_range in (0, 2**31, 10**30):
+        with pytest.raises(ValueError):
+            contacts_repository.decode_cursor(contacts_repository.encode_cursor(out_of_range))
+    assert contacts_repository.decode_cursor(contacts_repository.encode_cursor(2**31 - 1)) == 2**31 - 1
+
+
+def test_search_contacts(in_memory_db):
+    db = in_memory_db
+    username = "searchcontacts@example.com"
+    password = passwords.get_password_hash("pass")
+    user = user_repository.create_user(db, username, password, UserRole.USER)
+    names = [("Alexander", "Smith"), ("Sandra", "Alexandrova"),
+             ("Bob", "Brown"), ("Al", "Jones")]
+    for i, (first, last) in enumerate(names):
+        contact_data = ContactCreate(
+            first_name=first,
+            last_name=last,
+            email=f"{first.lower()}@example.com",
+            phone=f"66600{i}",
+            birthday="2000-01-01",
+            extra_data=None
+        )
+        contacts_repository.create_contact(db, contact_data, user.id)
+    result = contacts_repository.search_contacts(db, user.id, q="alexand")
+    assert {c.first_name for c in result} == {"Alexander", "Sandra"}
+    result = contacts_repository.search_contacts(db, user.id, q="al")
+    assert result[0].first_name in ("Al", "Alexander")
+    assert "Bob" not in {c.first_name for c in result}
+    result = contacts_repository.search_contacts(
+        db, user.id, last_name="smi")
+    assert [c.first_name for c in result] == ["Alexander"]
+    result = contacts_repository.search_contacts(db, user.id, limit=2)
+    assert len(result) == 2
+
+
+def test_upcoming_birthdays(in_memory_db):
+    db = in_memory_db
+    username = "birthdays@example.com"
+    password = passwords.get_password_hash("pass")
+    user = user_repository.create_user(db, username, password, UserRole.USER)
+    birthdays = {"Dec": "1980-12-30", "Jan": "1995-01-02",
+                 "Feb": "2000-02-29", "Jun": "1990-06-15"}
+    for i, (name, birthday) in enumerate(birthdays.items()):
+        contact_data = ContactCreate(
+            first_name=name,
+            last_name="Birthday",
+            email=f"bday{i}@example.com",
+            phone=f"77700{i}",
+            birthday=birthday,
+            extra_data=None
+        )
+        contacts_repository.create_contact(db, contact_data, user.id)
+    result = contacts_repository.get_upcoming_birthdays(
+        db, user.id, days=7, today=date(2025, 12, 28))
+    assert [c.first_name for c in result] == ["Dec", "Jan"]
+    result = contacts_repository.get_upcoming_birthdays(
+        db, user.id, days=3, today=date(2025, 2, 25))
+    assert [c.first_name for c in result] == ["Feb"]
+    result = contacts_repository.get_upcoming_birthdays(
+        db, user.id, days=366, today=date(2025, 7, 1))
+    assert len(result) == 4
+
+
+def test_bulk_create_contacts(in_memory_db):
+    db = in_memory_db
+    username = "bulkcontacts@example.com"
+    password = passwords.get_password_hash("pass")
+    user = user_repository.create_user(db, username, password, UserRole.USER)
+    existing = ContactCreate(first_name="Old", last_name="One", email="old@example.com",
+                             phone="900", birthday="2000-01-01", extra_data=None)
+    contacts_repository.create_contact(db, existing, user.id)
+    batch = [
+        ContactCreate(first_name="New", last_name="One", email="new1@example.com",
+                      phone="901", birthday="2000-03-04", extra_data=None),
+        ContactCreate(first_name="Dup", last_name="Email", email="old@example.com",
+                      phone="902", birthday="2000-01-01", extra_data=None),
+        ContactCreate(first_name="Dup", last_name="Phone", email="new3@example.com",
+                      phone="901", birthday="2000-01-01", extra_data=None),
+    ]
+    results = contacts_repository.bulk_create_contacts(db, batch, user.id)
+    assert results[0] is None
+    assert "Email" in results[1]
+    assert "Phone" in results[2]
+    contacts = contacts_repository.get_contacts(db, user.id)
+    assert len(contacts) == 2
+    assert db.get(Contact, contacts[1].id).birthday_key == 304
+
+
+def test_contact_import_parsers():
+    import io
+    from src.services import contact_import
+    csv_data = (b"\xef\xbb\xbffirst_name,last_name,email,phone,birthday,extra_data\r\n"
+                b"Ann,Lee,ann@example.com,111,1990-02-03,\r\n"
+                b"Bad,Row,not-an-email,112,1990-02-03,note\r\n")
+    rows = list(contact_import.iter_csv(io.BytesIO(csv_data)))
+    assert rows[0] == (1, {"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com",
+                           "phone": "111", "birthday": "1990-02-03", "extra_data": ""})
+    assert isinstance(contact_import._validate(rows[0][1]), ContactCreate)
+    assert "email" in contact_import._validate(rows[1][1])
+    ndjson_data = b'{"first_name": "Ann"}\n\n[1]\n{broken\n'
+    rows = list(contact_import.iter_ndjson(io.BytesIO(ndjson_data)))
+    assert [row for row, _ in rows] == [1, 3, 4]
+    assert rows[1][1] == "Expected a JSON object"
+    vcard_data = (b"BEGIN:VCARD\r\nVERSION:3.0\r\nN:Doe;Jane;;;\r\n"
+                  b"EMAIL;TYPE=work:jane@exam\r\n ple.com\r\nTEL:+380501234567\r\n"
+                  b"BDAY:19900203\r\nEND:VCARD\r\n")
+    rows = list(contact_import.iter_vcard(io.BytesIO(vcard_data)))
+    assert rows == [(1, {"first_name": "Jane", "last_name": "Doe", "email": "jane@example.com",
+                         "phone": "+380501234567", "birthday": "1990-02-03"})]
+    assert contact_import.detect_format("book.vcf", None) == "vcard"
+
+
+def test_iter_contacts(in_memory_db):
+    db = in_memory_db
+    username = "exportcontacts@example.com"
+    password = passwords.get_password_hash("pass")
+    user = user_repository.create_user(db, username, password, UserRole.USER)
+    for i in range(5):
+        contact_data = ContactCreate(
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            email=f"export{i}@example.com",
+            phone=f"88800{i}",
+            birthday="2000-01-01",
+            extra_data=None
+        )
+        contacts_repository.create_contact(db, contact_data, user.id)
+    batches = list(contacts_repository.iter_contacts(db, user.id, batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0].email == "export0@example.com"
 
 
 def test_update_contact(in_memory_db):